@@ -1,23 +1,44 @@
 # Weatherly.py
+import time
+_START = time.perf_counter()  # for --profile-startup
+
 import customtkinter as ctk
-import requests
-from PIL import Image, ImageTk
+import tkinter
 import os
+import math
+import sys
 from datetime import datetime
 import hashlib
+import threading
+from collections import OrderedDict
 import database  # local module, make sure database.py is in same folder
+import weather_api  # local module, holds API_KEY and the fetch worker
+import perf  # timing spans, shown on the admin Performance tab
+import eventlog  # structured JSON-lines log (logs/weatherly.log)
+from cities import city_index  # local city table (data/cities.bin) for type-ahead and IDs
 import sqlite3
 
-# ---------- CONFIG ----------
-API_KEY = "YOUR API KEY HERE"
-WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
-FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+# requests, PIL and forecast_series (NumPy) are imported lazily, where
+# they're used, to keep cold start fast; the welcome screen needs none.
+
+_IMPORTS_DONE = time.perf_counter()
 
+# ---------- CONFIG ----------
 ICON_DIR = "icons"  # keep your existing icons here
-# -----------------------------
+ICON_SIZES = [(120, 120), (40, 40), (32, 32), (24, 24)]  # every size the UI asks for
+ICON_CACHE_MAX = 64  # PhotoImages kept alive by IconCache
+ICON_CACHE_DIR = os.path.join(ICON_DIR, ".scaled")  # pre-scaled copies; set to None to disable
+
+STARTUP_TARGET_MS = 500  # budget checked by --profile-startup
 
-# initialize DB
-database.init_db()
+# auto-refresh choices offered in Settings (minutes, 0 = off)
+REFRESH_CHOICES = {"Off": 0, "5 min": 5, "15 min": 15, "30 min": 30, "60 min": 60}
+
+PERF_REFRESH_MS = 2000  # admin Performance tab redraw interval
+SUGGEST_DEBOUNCE_MS = 150  # typing pause before the city suggestions update
+SUGGEST_MIN_CHARS = 2
+PERF_ROW = "{:<34}{:>8}{:>8}{:>10}{:>10}{:>10}{:>10}"
+# -----------------------------
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -26,15 +47,184 @@ ctk.set_default_color_theme("blue")
 def hash_pw(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
+class IconAtlas:
+    """
+    Decoded, pre-scaled icons held in memory as PIL images.
+
+    preload() decodes every PNG in ICON_DIR once and resamples it to each of
+    ICON_SIZES, reusing files in ICON_CACHE_DIR that are newer than their
+    source. It is safe to run on a background thread; the Tk PhotoImages
+    are created later, on the main thread, by load_icon().
+    """
+
+    def __init__(self, icon_dir=ICON_DIR, sizes=ICON_SIZES, cache_dir=ICON_CACHE_DIR):
+        self.icon_dir = icon_dir
+        self.sizes = list(sizes)
+        self.cache_dir = cache_dir
+        self._images = {}  # (name, size) -> PIL image
+        self._lock = threading.Lock()
+
+    def preload(self):
+        try:
+            names = sorted(n for n in os.listdir(self.icon_dir) if n.lower().endswith(".png"))
+        except OSError:
+            return
+        for name in names:
+            source = None
+            for size in self.sizes:
+                if (name, size) in self._images:
+                    continue
+                try:
+                    img, source = self._scaled(name, size, source)
+                except Exception as e:
+                    eventlog.error("icon_preload_failed", e, icon=name)
+                    break
+                with self._lock:
+                    self._images[(name, size)] = img
+
+    def preload_in_background(self):
+        threading.Thread(target=self.preload, name="weatherly-icons", daemon=True).start()
+
+    def image(self, name, size):
+        """The scaled PIL image, or None if the icon can't be loaded."""
+        size = tuple(size)
+        with self._lock:
+            img = self._images.get((name, size))
+        if img is not None:
+            return img
+        # not preloaded (yet, or an unusual size): scale it now
+        try:
+            img, _source = self._scaled(name, size, None)
+        except Exception:
+            return None
+        with self._lock:
+            self._images[(name, size)] = img
+        return img
+
+    def _scaled(self, name, size, source):
+        # returns (scaled image, decoded source) so callers can reuse the source
+        from PIL import Image
+
+        path = os.path.join(self.icon_dir, name)
+        cached = None
+        if self.cache_dir:
+            stem = os.path.splitext(name)[0]
+            cached = os.path.join(self.cache_dir, f"{stem}_{size[0]}x{size[1]}.png")
+            try:
+                if os.path.getmtime(cached) >= os.path.getmtime(path):
+                    img = Image.open(cached).convert("RGBA")
+                    img.load()
+                    return img, source
+            except OSError:
+                pass
+
+        if source is None:
+            source = Image.open(path).convert("RGBA")
+        img = source.resize(size, Image.LANCZOS)
+
+        if cached:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                img.save(cached)
+            except OSError:
+                pass  # read-only install: keep it in memory only
+        return img, source
+
+
+icon_atlas = IconAtlas()
+
+
+@perf.timed("icon.load")
 def load_icon(name, size=(64, 64)):
-    path = os.path.join(ICON_DIR, name)
+    # must be called on the Tk main thread (PhotoImage)
+    from PIL import ImageTk
+
+    img = icon_atlas.image(name, size)
+    if img is None:
+        return None
+    return ImageTk.PhotoImage(img)
+
+
+def load_welcome_art(size):
     try:
-        img = Image.open(path).convert("RGBA")
-        img = img.resize(size, Image.LANCZOS)
+        from PIL import Image, ImageTk
+
+        img = Image.open("welcome.png")
+        img = img.resize(size)
         return ImageTk.PhotoImage(img)
-    except Exception:
+    except Exception as e:
+        eventlog.error("welcome_art_failed", e)
         return None
 
+
+class IconCache:
+    """
+    Bounded LRU cache of Tk PhotoImages keyed by (filename, size).
+
+    Icons that fail to load are cached too, so a missing file isn't retried
+    on every update. One instance (WeatherApp.icon_cache) is shared by the
+    main window and its Toplevels; like PhotoImage it is main-thread only.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries=ICON_CACHE_MAX):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (filename, size) -> PhotoImage or _MISSING
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.load_seconds = 0.0
+
+    def get(self, filename, size=(64, 64)):
+        key = (filename, tuple(size))
+        img = self._entries.get(key)
+        if img is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return None if img is self._MISSING else img
+
+        self.misses += 1
+        start = time.perf_counter()
+        img = load_icon(filename, size=size)
+        self.load_seconds += time.perf_counter() - start
+        if img is None:
+            self.failures += 1
+
+        self._entries[key] = self._MISSING if img is None else img
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return img
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "load_ms": round(self.load_seconds * 1000, 2),
+        }
+
+def format_timestamp(ts):
+    # database timestamps are unix time (UTC)
+    return datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+def format_age(seconds):
+    # "just now", "5 min ago", "3 h ago", "2 days ago"
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    if minutes < 48 * 60:
+        return f"{minutes // 60} h ago"
+    return f"{minutes // (24 * 60)} days ago"
+
 def map_weather_to_icon(weather_main, weather_id=None):
     main = (weather_main or "").lower()
     if main == "clear":
@@ -75,13 +265,9 @@ class WelcomeScreen(ctk.CTkFrame):
         left = ctk.CTkFrame(self, width=400, corner_radius=20, fg_color="#1f2630")
         left.pack(side="left", fill="both", expand=True, padx=20, pady=20)
 
-        # Load your custom welcome icon for the left side
-        img_left = Image.open("welcome.png")
-        img_left = img_left.resize((160, 160))  # you can increase or reduce this
-        self.left_icon = ImageTk.PhotoImage(img_left)
-
-        art_label = ctk.CTkLabel(left, image=self.left_icon, text="")
-        art_label.place(relx=0.5, rely=0.5, anchor="center")
+        # Custom welcome icon for the left side, loaded once the screen is up
+        self.art_label = ctk.CTkLabel(left, text="")
+        self.art_label.place(relx=0.5, rely=0.5, anchor="center")
 
         # ========== RIGHT SIDE ==========
         self.right = ctk.CTkFrame(self, width=400, corner_radius=20, fg_color="#111111")
@@ -90,6 +276,16 @@ class WelcomeScreen(ctk.CTkFrame):
 
         # Start with welcome content
         self.show_welcome_content()
+        self.after_idle(self.load_art)
+
+    def load_art(self):
+        # PIL is only imported here, after the first frame is drawn
+        self.left_icon = load_welcome_art((160, 160))  # you can increase or reduce this
+        if self.left_icon:
+            self.art_label.configure(image=self.left_icon)
+        self.welcome_icon = load_welcome_art((120, 120))  # adjust size if you want
+        if self.welcome_icon and self.icon_label.winfo_exists():
+            self.icon_label.configure(image=self.welcome_icon)
 
     # ================== FIRST VIEW ==================
     def show_welcome_content(self):
@@ -97,13 +293,9 @@ class WelcomeScreen(ctk.CTkFrame):
         for w in self.right.winfo_children():
             w.destroy()
 
-        # Load custom welcome icon
-        img = Image.open("welcome.png")
-        img = img.resize((120, 120))  # adjust size if you want
-        self.welcome_icon = ImageTk.PhotoImage(img)
-
-        icon = ctk.CTkLabel(self.right, image=self.welcome_icon, text="")
-        icon.pack(pady=(80, 10))
+        # Custom welcome icon (filled in by load_art on first show)
+        self.icon_label = ctk.CTkLabel(self.right, image=getattr(self, "welcome_icon", None), text="")
+        self.icon_label.pack(pady=(80, 10))
 
         ctk.CTkLabel(self.right, text="Weatherly", font=("Arial", 28, "bold")).pack()
         ctk.CTkLabel(self.right, text="Weather App", font=("Arial", 14)).pack(pady=(0, 20))
@@ -479,6 +671,139 @@ class RegisterScreen(ctk.CTkFrame):
         ls.pack(fill="both", expand=True, padx=12, pady=12)
 
 
+# ------------------ Virtualized List ------------------
+
+class VirtualList(ctk.CTkFrame):
+    """
+    Scrollable list that only builds widgets for the rows in view.
+
+    make_row(parent) builds one empty row and bind_row(row, item) fills it
+    with an item. Rows are recycled as the list scrolls, so the widget count
+    depends on the visible height, not on len(items). on_end, if given, is
+    called whenever the last item is in view (used for infinite scroll).
+    """
+
+    def __init__(self, parent, make_row, bind_row, empty_text="", on_end=None,
+                 row_padx=8, row_pady=4, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.make_row = make_row
+        self.bind_row = bind_row
+        self.on_end = on_end
+        self.row_padx = row_padx
+        self.row_pady = row_pady
+        self.items = []
+        self.offset = 0  # index of the first visible item
+        self.rows = []
+        self._in_on_end = False
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 4), pady=6)
+
+        # rows are packed into body; body's size comes from the parent only
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.body.pack_propagate(False)
+        self.body.bind("<Configure>", lambda e: self._fit_rows(e.height))
+
+        self.empty_label = ctk.CTkLabel(self.body, text=empty_text)
+        self._bind_wheel(self.body)
+
+    # ----- data -----
+    def set_items(self, items, keep_offset=False):
+        self.items = list(items)
+        if not keep_offset:
+            self.offset = 0
+        self._render()
+
+    def extend(self, items):
+        self.items.extend(items)
+        self._render()
+
+    def refresh(self):
+        self._render()
+
+    # ----- scrolling -----
+    def scroll_to(self, index):
+        self.offset = index
+        self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.items)))
+        elif action == "scroll":
+            step = len(self.rows) if unit == "pages" else 1
+            self.scroll_to(self.offset + int(value) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            delta = -1
+        elif getattr(event, "num", None) == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.scroll_to(self.offset + delta * 3)
+
+    def _bind_wheel(self, widget):
+        # Tk doesn't bubble wheel events up to the parent, so bind every
+        # descendant (including CTk's internal canvases and labels)
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tkinter.Misc.bind(widget, seq, self._on_wheel, add="+")
+        for child in tkinter.Misc.winfo_children(widget):
+            self._bind_wheel(child)
+
+    # ----- layout -----
+    def _fit_rows(self, height):
+        if height <= 1:
+            return
+        if not self.rows:
+            self._add_row()
+        step = self.rows[0].winfo_reqheight() + 2 * self.row_pady
+        needed = max(1, height // max(step, 1))
+        while len(self.rows) < needed:
+            self._add_row()
+        while len(self.rows) > needed:
+            self.rows.pop().destroy()
+        self._render()
+
+    def _add_row(self):
+        row = self.make_row(self.body)
+        self._bind_wheel(row)
+        self.rows.append(row)
+
+    def _render(self):
+        count = len(self.items)
+        visible = len(self.rows)
+        self.offset = max(0, min(self.offset, count - visible))
+
+        if count == 0 and self.empty_label.cget("text"):
+            self.empty_label.pack(pady=10)
+        else:
+            self.empty_label.pack_forget()
+
+        # visible rows are always a prefix of self.rows, so re-packing in
+        # order keeps them in order
+        for i, row in enumerate(self.rows):
+            index = self.offset + i
+            if index < count:
+                self.bind_row(row, self.items[index])
+                if not row.winfo_manager():
+                    row.pack(fill="x", padx=self.row_padx, pady=self.row_pady)
+            elif row.winfo_manager():
+                row.pack_forget()
+
+        if count:
+            self.scrollbar.set(self.offset / count, min(1.0, (self.offset + visible) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        if self.on_end and count and self.offset + visible >= count and not self._in_on_end:
+            self._in_on_end = True
+            try:
+                self.on_end()
+            finally:
+                self._in_on_end = False
+
+
 # ------------------ Admin Dashboard ------------------
 
 class AdminDashboard(ctk.CTkFrame):
@@ -503,11 +828,21 @@ class AdminDashboard(ctk.CTkFrame):
             text=f"Total Users: {database.get_user_count()}",
             font=("Arial", 16, "bold")
         )
-        self.total_label.pack(padx=12, pady=10)
+        self.total_label.pack(side="left", padx=12, pady=10)
+
+        self.usage_label = ctk.CTkLabel(stats, text="", font=("Arial", 14))
+        self.usage_label.pack(side="right", padx=12, pady=10)
+        self.load_api_usage()
+
+        # ================= TABS ================
+        self.tabs = ctk.CTkTabview(self, fg_color="#141414", command=self.on_tab_changed)
+        self.tabs.pack(fill="both", expand=True, padx=20)
+        self.tabs.add("Users & Logs")
+        self.tabs.add("Performance")
 
         # ================= MAIN SPLIT (LEFT + RIGHT) ================
-        main = ctk.CTkFrame(self, fg_color="transparent")
-        main.pack(fill="both", expand=True, padx=20)
+        main = ctk.CTkFrame(self.tabs.tab("Users & Logs"), fg_color="transparent")
+        main.pack(fill="both", expand=True)
 
         # ============================================================
         #                     LEFT PANEL (USERS)
@@ -517,7 +852,8 @@ class AdminDashboard(ctk.CTkFrame):
 
         ctk.CTkLabel(left, text="Users", font=("Arial", 20, "bold")).pack(pady=10)
 
-        self.user_list = ctk.CTkScrollableFrame(left, fg_color="#222222", corner_radius=10)
+        self.user_list = VirtualList(left, make_row=self.make_user_row, bind_row=self.bind_user_row,
+                                     empty_text="No users", fg_color="#222222", corner_radius=10)
         self.user_list.pack(fill="both", expand=True, padx=15, pady=10)
 
         self.selected_user = None
@@ -559,8 +895,15 @@ class AdminDashboard(ctk.CTkFrame):
         ).pack(side="left", padx=6)
 
         # logs display
-        self.logs_list = ctk.CTkScrollableFrame(right, fg_color="#222222", corner_radius=10)
+        self.logs_list = VirtualList(right, make_row=self.make_log_row, bind_row=self.bind_log_row,
+                                     on_end=self.load_more_logs,
+                                     fg_color="#222222", corner_radius=10)
         self.logs_list.pack(fill="both", expand=True, padx=15, pady=10)
+        self.logs_query = ""
+        self.logs_cursor = (None, None)
+        self.logs_more = False
+
+        self.build_perf_tab(self.tabs.tab("Performance"))
 
         # ================= LOGOUT =================
         ctk.CTkButton(
@@ -572,41 +915,49 @@ class AdminDashboard(ctk.CTkFrame):
             command=self.logout
         ).pack(pady=15)
 
+    # ============================================================
+    #                     API USAGE (shared API_KEY quota)
+    # ============================================================
+    def load_api_usage(self):
+        usage = database.get_api_usage(7)  # [(day, calls, throttled)]
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        calls, throttled = next(((c, t) for d, c, t in usage if d == today), (0, 0))
+        week = sum(c for _d, c, _t in usage)
+        self.usage_label.configure(
+            text=f"API calls today: {calls} ({throttled} throttled) · last 7 days: {week}")
+
     # ============================================================
     #                     LOAD USERS
     # ============================================================
     def load_users(self):
-        # clear list first
-        for w in self.user_list.winfo_children():
-            w.destroy()
-
         users = database.get_all_users()  # [(username, role)]
 
-        self.user_rows = {}  # store rows so we can highlight one later
         self.selected_user = None
+        self.user_list.set_items(users)
 
-        for username, role in users:
-            row = ctk.CTkFrame(self.user_list, fg_color="#2b2b2b", corner_radius=8)
-            row.pack(fill="x", padx=8, pady=4)
+    def make_user_row(self, parent):
+        row = ctk.CTkFrame(parent, fg_color="#2b2b2b", corner_radius=8, height=40)
+        row.pack_propagate(False)
 
-            label = ctk.CTkLabel(row, text=f"{username} ({role})", font=("Arial", 14))
-            label.pack(side="left", padx=10, pady=8)
+        row.label = ctk.CTkLabel(row, text="", font=("Arial", 14))
+        row.label.pack(side="left", padx=10, pady=8)
 
-            # make both row and label clickable
-            row.bind("<Button-1>", lambda e, u=username, r=row: self.select_user(u, r))
-            label.bind("<Button-1>", lambda e, u=username, r=row: self.select_user(u, r))
+        # make both row and label clickable (row.username follows recycling)
+        row.bind("<Button-1>", lambda e, r=row: self.select_user(r.username))
+        row.label.bind("<Button-1>", lambda e, r=row: self.select_user(r.username))
+        return row
 
-            self.user_rows[username] = row
+    def bind_user_row(self, row, user):
+        username, role = user
+        row.username = username
+        row.label.configure(text=f"{username} ({role})")
+        row.configure(fg_color="#444444" if username == self.selected_user else "#2b2b2b")
 
-    def select_user(self, username, row_widget):
+    def select_user(self, username):
         self.selected_user = username
 
         # highlight clicked row, un-highlight others
-        for user, row in self.user_rows.items():
-            if user == username:
-                row.configure(fg_color="#444444")
-            else:
-                row.configure(fg_color="#2b2b2b")
+        self.user_list.refresh()
 
         # auto-fill log search field
         try:
@@ -630,26 +981,7 @@ class AdminDashboard(ctk.CTkFrame):
             pass
 
         # Load logs for selected user
-        logs = database.get_logs_for_user(self.selected_user)
-
-        # Clear current logs
-        for w in self.logs_list.winfo_children():
-            w.destroy()
-
-        if not logs:
-            ctk.CTkLabel(self.logs_list, text="No logs found").pack(pady=10)
-            return
-
-        # Show logs in the right panel
-        for timestamp, city, temp in logs:
-            row = ctk.CTkFrame(self.logs_list, fg_color="#2b2b2b", corner_radius=8)
-            row.pack(fill="x", padx=8, pady=4)
-
-            ctk.CTkLabel(
-                row,
-                text=f"{timestamp} — {city} ({temp}°C)",
-                font=("Arial", 13)
-            ).pack(padx=10, pady=6)
+        self.show_logs(self.selected_user)
 
     # ============================================================
     #                     DELETE USER
@@ -671,31 +1003,153 @@ class AdminDashboard(ctk.CTkFrame):
     # ============================================================
     def load_logs(self):
         username = self.log_username.get().strip()
+        self.show_logs(username)
+
+    def show_logs(self, username):
+        # logs are fetched one keyset page at a time (see database.get_logs_page)
+        # and more pages are pulled in as the list scrolls to its end
+        self.logs_query = username
+        self.logs_cursor = (None, None)
+        self.logs_more = True
+        self.logs_list.empty_label.configure(text="No logs found")
+        self.logs_list.set_items([])
+        self.load_more_logs()
+
+    def load_more_logs(self):
+        if not self.logs_more:
+            return
 
-        for w in self.logs_list.winfo_children():
-            w.destroy()
+        logs = database.get_logs_page(self.logs_query, *self.logs_cursor)
+        # logs are like: [(id, timestamp, city, temp), ...]
 
-        logs = database.get_logs_for_user(username)
-        # logs must be like: [(timestamp, city, temp), ...]
+        # a full page means there may be more
+        self.logs_more = len(logs) == database.LOGS_PAGE_SIZE
+        if logs:
+            self.logs_cursor = (logs[-1][1], logs[-1][0])
+            self.logs_list.extend(logs)
 
-        if not logs:
-            ctk.CTkLabel(self.logs_list, text="No logs found").pack(pady=10)
-            return
+    def make_log_row(self, parent):
+        row = ctk.CTkFrame(parent, fg_color="#2b2b2b", corner_radius=8, height=36)
+        row.pack_propagate(False)
+        row.label = ctk.CTkLabel(row, text="", font=("Arial", 13))
+        row.label.pack(padx=10, pady=6)
+        return row
+
+    def bind_log_row(self, row, log):
+        _id, timestamp, city, temp = log
+        row.label.configure(text=f"{format_timestamp(timestamp)} — {city} ({temp}°C)")
+
+    # ============================================================
+    #                     PERFORMANCE (spans recorded by perf.py)
+    # ============================================================
+    def build_perf_tab(self, tab):
+        top = ctk.CTkFrame(tab, fg_color="transparent")
+        top.pack(fill="x", padx=15, pady=10)
+
+        self.perf_status = ctk.CTkLabel(top, text="", font=("Arial", 13))
+        self.perf_status.pack(side="left", padx=6)
+
+        ctk.CTkButton(
+            top, text="Export JSON", width=120,
+            command=self.export_perf
+        ).pack(side="right", padx=6)
 
-        for timestamp, city, temp in logs:
-            row = ctk.CTkFrame(self.logs_list, fg_color="#2b2b2b", corner_radius=8)
-            row.pack(fill="x", padx=8, pady=4)
+        ctk.CTkButton(
+            top, text="Reset", width=90,
+            fg_color="#444444", hover_color="#666",
+            command=self.reset_perf
+        ).pack(side="right", padx=6)
+
+        # icon and API response cache counters, next to the span timings
+        self.cache_status = ctk.CTkLabel(tab, text="", font=("Courier", 13), anchor="w",
+                                         justify="left")
+        self.cache_status.pack(fill="x", padx=27, pady=(0, 8))
 
-            ctk.CTkLabel(
-                row,
-                text=f"{timestamp} — {city} ({temp}°C)",
-                font=("Arial", 13)
-            ).pack(padx=10, pady=6)
+        ctk.CTkLabel(
+            tab, anchor="w", font=("Courier", 13, "bold"),
+            text=PERF_ROW.format("span", "count", "errors", "p50 ms", "p95 ms", "p99 ms", "max ms")
+        ).pack(fill="x", padx=27)
+
+        self.perf_list = VirtualList(tab, make_row=self.make_perf_row, bind_row=self.bind_perf_row,
+                                     empty_text="Nothing recorded yet",
+                                     fg_color="#222222", corner_radius=10)
+        self.perf_list.pack(fill="both", expand=True, padx=15, pady=10)
+        self._perf_after = None
+
+    def on_tab_changed(self):
+        if self.tabs.get() == "Performance" and self._perf_after is None:
+            self.refresh_perf()
+
+    def refresh_perf(self):
+        # re-reads the histograms every PERF_REFRESH_MS while the tab is shown
+        self._perf_after = None
+        if not self.winfo_ismapped() or self.tabs.get() != "Performance":
+            return
+        self.perf_list.set_items(perf.registry.snapshot().items(), keep_offset=True)
+        url = perf.metrics_url()
+        self.perf_status.configure(
+            text=f"Prometheus endpoint: {url}" if url
+            else "Metrics endpoint off (set WEATHERLY_METRICS_PORT to enable)")
+        self.cache_status.configure(text=self.cache_summary())
+        self._perf_after = self.after(PERF_REFRESH_MS, self.refresh_perf)
+
+    def cache_summary(self):
+        icons = self.app.icon_cache.stats()
+        responses = weather_api.response_cache.stats()
+        lookups = responses["hits"] + responses["misses"]
+        return (
+            f"Icon cache:     {icons['entries']} images, {icons['hits']} hits / "
+            f"{icons['misses']} misses ({icons['hit_ratio']:.0%}), {icons['failures']} failed, "
+            f"{icons['load_ms']} ms loading\n"
+            f"Response cache: {responses['entries']} entries, {responses['bytes'] / 1024:.0f} KB, "
+            f"{responses['hits']} hits / {responses['misses']} misses "
+            f"({responses['hits'] / lookups if lookups else 0:.0%})")
+
+    def make_perf_row(self, parent):
+        row = ctk.CTkFrame(parent, fg_color="#2b2b2b", corner_radius=8, height=32)
+        row.pack_propagate(False)
+        row.label = ctk.CTkLabel(row, text="", font=("Courier", 13), anchor="w")
+        row.label.pack(fill="x", padx=10, pady=4)
+        return row
+
+    def bind_perf_row(self, row, item):
+        name, stats = item
+
+        def ms(value):
+            return "-" if value is None else f"{value:.1f}"
+
+        row.label.configure(text=PERF_ROW.format(
+            name, stats["count"], stats["errors"],
+            ms(stats["p50_ms"]), ms(stats["p95_ms"]), ms(stats["p99_ms"]), ms(stats["max_ms"])))
+        row.configure(fg_color="#4a2626" if stats["errors"] else "#2b2b2b")
+
+    def reset_perf(self):
+        perf.registry.reset()
+        self.perf_list.set_items([])
+
+    def export_perf(self):
+        from tkinter import filedialog
+
+        path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".json",
+            initialfile=f"weatherly-perf-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            perf.export_json(path)
+            self.perf_status.configure(text=f"Exported to {path}")
+        except OSError as e:
+            eventlog.error("perf_export_failed", e, path=path)
+            self.perf_status.configure(text="Export failed")
 
     # ============================================================
     #                     LOGOUT
     # ============================================================
     def logout(self):
+        if self._perf_after is not None:
+            self.after_cancel(self._perf_after)
+            self._perf_after = None
         self.app.current_user = None
         self.pack_forget()
         self.app.welcome = WelcomeScreen(self.app.container, self.app)
@@ -719,12 +1173,26 @@ class WeatherApp(ctk.CTk):
         self.container.pack(fill="both", expand=True, padx=12, pady=12)
 
         # app state
-        self.icon_cache = {}
+        self.icon_cache = IconCache()  # shared with Toplevel windows
         self.current_user = None   # username string when logged in
-        # load saved settings
-        self.settings = database.get_settings()
-        self.temp_unit = self.settings["unit"]
-        self.dynamic_bg = self.settings["dynamic_bg"]
+        self.fetcher = weather_api.FetchWorker(self)  # network I/O off the Tk thread
+        # periodic refresh of the shown city + favorites (interval from settings)
+        self.refresher = weather_api.AutoRefresher(
+            self,
+            get_city=self.shown_city,
+            get_units=self.api_units,
+            on_current=self.on_auto_refresh,
+        )
+        # re-fetches searches that were answered from the cache while offline
+        self.offline_sync = weather_api.OfflineSync(self, on_result=self.on_auto_refresh)
+        # schema check/migration runs in the background; any DB call made
+        # before it finishes waits for it (see database.get_connection)
+        threading.Thread(target=database.init_db, name="weatherly-db-init", daemon=True).start()
+
+        # saved settings are loaded on login (load_settings)
+        self.settings = {"unit": "C", "dynamic_bg": True, "refresh_minutes": 0}
+        self.temp_unit = "C"
+        self.dynamic_bg = True
 
         # show welcome (Get Started -> shows login)
         self.welcome = WelcomeScreen(self.container, self)
@@ -736,7 +1204,26 @@ class WeatherApp(ctk.CTk):
         self.main_frame = None
         self.admin_frame = None
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # drop long-expired cached API responses without blocking startup
+        weather_api.prune_disk_cache_in_background()
+        # decode and pre-scale icons before the first search needs them
+        icon_atlas.preload_in_background()
+        # city names for search suggestions (no-op without data/city.list.json.gz)
+        city_index.load_in_background()
+
     # ----------------- screen flow -----------------
+    @property
+    def current_user(self):
+        return self._current_user
+
+    @current_user.setter
+    def current_user(self, username):
+        # every event logged from here on is tagged with this user
+        self._current_user = username
+        eventlog.set_user(username)
+
     def show_login(self):
         # hide welcome
         self.welcome.pack_forget()
@@ -784,9 +1271,20 @@ class WeatherApp(ctk.CTk):
         # show it
         self.register_frame.pack(fill="both", expand=True, padx=12, pady=12)
 
+    def load_settings(self):
+        self.settings = database.get_settings()
+        self.temp_unit = self.settings["unit"]
+        self.dynamic_bg = self.settings["dynamic_bg"]
+        self.refresher.set_interval(self.settings["refresh_minutes"] * 60)
+        self.offline_sync.start()
+
+    def api_units(self):
+        return "metric" if self.temp_unit == "C" else "imperial"
+
     def show_main_for_user(self):
         # called after normal user logs in
         self.current_user = getattr(self, "current_user", None)
+        self.load_settings()
         # remove login screen
         if self.login_frame:
             self.login_frame.pack_forget()
@@ -870,9 +1368,24 @@ class WeatherApp(ctk.CTk):
         search_row.pack(fill="x", pady=(12, 6), padx=12)
 
         self.search_entry = ctk.CTkEntry(search_row, placeholder_text="Search for city e.g. London, Tokyo", width=380)
-        self.search_entry.bind("<Return>", lambda event: self.search_and_update())
+        self.search_entry.bind("<Return>", lambda event: self.on_search_return())
+        self.search_entry.bind("<Escape>", lambda event: (self.hide_suggestions(), self.cancel_search()))
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_entry.bind("<Down>", lambda event: self.move_suggestion(1))
+        self.search_entry.bind("<Up>", lambda event: self.move_suggestion(-1))
+        self.search_entry.bind("<FocusOut>", lambda event: self.after(200, self.hide_suggestions))
         self.search_entry.pack(side="left", padx=(8, 6), pady=8)
 
+        # type-ahead dropdown, placed under the entry while there are suggestions
+        self.suggest_box = ctk.CTkFrame(self.center, corner_radius=8, fg_color="#2b2b2b")
+        self.suggest_buttons = []
+        self.suggestions = []
+        self.suggest_index = -1
+        self._suggest_after = None
+        self._suggest_text = ""
+        self._picked_city = None  # cities.City chosen from the dropdown
+        self.forecast_series = None  # ForecastSeries of the weather on screen
+
         # search button
         search_btn = ctk.CTkButton(search_row, text="Search", width=90, command=self.search_and_update)
         search_btn.pack(side="left", padx=(6, 6), pady=8)
@@ -916,6 +1429,22 @@ class WeatherApp(ctk.CTk):
         hourly_frame.pack(fill="x", padx=12, pady=(6, 12))
         self.hourly_container = hourly_frame
 
+        # Save references for updating (7 hourly cells, reused on every search)
+        hr_frame = ctk.CTkFrame(self.hourly_container, corner_radius=8)
+        hr_frame.pack(fill="x", padx=6, pady=8)
+        self.hourly_widgets = []
+        for i in range(7):
+            cell = ctk.CTkFrame(hr_frame, corner_radius=8, width=110, height=120)
+            cell.pack(side="left", padx=10, pady=6)
+            cell.pack_propagate(False)
+            time_lbl = ctk.CTkLabel(cell, text="", font=("Arial", 11))
+            time_lbl.pack(padx=6, pady=(6, 2))
+            icon_lbl = ctk.CTkLabel(cell, text="")
+            icon_lbl.pack()
+            temp_lbl = ctk.CTkLabel(cell, text="", font=("Arial", 12, "bold"))
+            temp_lbl.pack(pady=(4, 8))
+            self.hourly_widgets.append((time_lbl, icon_lbl, temp_lbl))
+
         lower_frame = ctk.CTkFrame(self.center, corner_radius=12)
         lower_frame.pack(fill="both", expand=True, padx=12, pady=(6, 12))
 
@@ -959,59 +1488,210 @@ class WeatherApp(ctk.CTk):
         # self.search_and_update()
 
     # ------------- Networking & UI (search, update) ----------------
-    def search_and_update(self):
+    def search_and_update(self, city_id=None):
         city = self.search_entry.get().strip()
         if not city:
             return
+        self.hide_suggestions()
+
+        # a picked suggestion (or a name the index knows exactly) is fetched by ID
+        if city_id is None:
+            picked = self._picked_city
+            if picked is None or picked.label != city:
+                picked = city_index.resolve(city)
+            city_id = picked.id if picked is not None else None
 
         self.error_label.configure(text="")
         self.city_label.configure(text="Fetching weather...")
-        self.update()
 
-        try:
-            units = "metric" if self.temp_unit == "C" else "imperial"
-            params = {"q": city, "appid": API_KEY, "units": units}
+        # runs on the fetch worker; a newer search drops this one's result
+        started = time.perf_counter()
+        self.fetcher.submit(
+            weather_api.fetch_weather, city, self.api_units(), city_id,
+            on_success=lambda result: self.on_weather_fetched(city, result, started),
+            on_error=lambda e: self.on_weather_error(e, city, started),
+        )
 
-            r = requests.get(WEATHER_URL, params=params, timeout=10)
-            r.raise_for_status()
-            current_data = r.json()
+    # ------------- Type-ahead suggestions ----------------
+    def on_search_key(self, event):
+        if event.keysym in ("Return", "Escape", "Up", "Down", "Tab"):
+            return
+        # debounce: only look up once typing pauses for SUGGEST_DEBOUNCE_MS
+        if self._suggest_after is not None:
+            self.after_cancel(self._suggest_after)
+        self._suggest_after = self.after(SUGGEST_DEBOUNCE_MS, self.update_suggestions)
+
+    def update_suggestions(self):
+        self._suggest_after = None
+        text = self.search_entry.get().strip()
+        if text == self._suggest_text:
+            return
+        self._suggest_text = text
+        if self._picked_city is not None and self._picked_city.label != text:
+            self._picked_city = None
+        if len(text) < SUGGEST_MIN_CHARS or not city_index.loaded:
+            self.hide_suggestions()
+            return
 
-            r2 = requests.get(FORECAST_URL, params=params, timeout=10)
-            r2.raise_for_status()
-            forecast_data = r2.json()
+        with perf.span("cities.suggest"):
+            self.suggestions = city_index.suggest(text)
+        self.suggest_index = -1
+        self.show_suggestions()
 
-            # ✅ ONLY UI UPDATE HERE
-            self.update_ui_with_data(current_data, forecast_data)
+    def show_suggestions(self):
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        while len(self.suggest_buttons) < len(self.suggestions):
+            i = len(self.suggest_buttons)
+            btn = ctk.CTkButton(self.suggest_box, text="", anchor="w", height=28,
+                                fg_color="transparent", hover_color="#3a3a3a",
+                                command=lambda i=i: self.pick_suggestion(i))
+            self.suggest_buttons.append(btn)
+        for i, btn in enumerate(self.suggest_buttons):
+            if i < len(self.suggestions):
+                btn.configure(text=self.suggestions[i].label,
+                              fg_color="#1f538d" if i == self.suggest_index else "transparent")
+                btn.pack(fill="x", padx=4, pady=1)
+            else:
+                btn.pack_forget()
+        self.suggest_box.place(in_=self.search_entry, relx=0, rely=1, y=4, relwidth=1)
+        self.suggest_box.lift()
+
+    def hide_suggestions(self):
+        if self._suggest_after is not None:
+            self.after_cancel(self._suggest_after)
+            self._suggest_after = None
+        self.suggestions = []
+        self.suggest_index = -1
+        try:
+            self.suggest_box.place_forget()
+        except Exception:
+            pass
 
-        except requests.exceptions.HTTPError:
-            self.city_label.configure(text="Not found")
-            self.error_label.configure(text="City not found. Check spelling.")
+    def move_suggestion(self, step):
+        if not self.suggestions:
             return
+        self.suggest_index = max(-1, min(len(self.suggestions) - 1, self.suggest_index + step))
+        self.show_suggestions()
 
-        except Exception as e:
-            print("Weather error:", e)
-            self.error_label.configure(text="Network error. Try again.")
+    def pick_suggestion(self, index):
+        city = self.suggestions[index]
+        self._picked_city = city
+        self._suggest_text = city.label
+        self.search_entry.delete(0, "end")
+        self.search_entry.insert(0, city.label)
+        self.search_and_update()
+
+    def on_search_return(self):
+        if self.suggest_index >= 0:
+            self.pick_suggestion(self.suggest_index)
+        else:
+            self.search_and_update()
+
+    def cancel_search(self):
+        if not self.fetcher.busy:
             return
+        self.fetcher.cancel()
+        self.city_label.configure(text=getattr(self, "_last_city", None) or "Welcome")
+
+    def on_weather_fetched(self, city, result, started=None):
+        current_data = result.current
+        if started is not None:
+            eventlog.event("search", city=city, stale=result.stale,
+                           age_s=round(time.time() - result.fetched_at),
+                           duration_ms=round((time.perf_counter() - started) * 1000, 3))
+        # ✅ ONLY UI UPDATE HERE
+        self.update_ui_with_data(current_data, result.forecast)
+        if result.stale:
+            self.city_label.configure(
+                text=f"{self._last_city} (cached {format_age(time.time() - result.fetched_at)})")
+            if weather_api.offline.active:
+                self.error_label.configure(text="Offline. Will refresh when the connection is back.")
+            else:
+                self.error_label.configure(
+                    text=f"Weather service unavailable. Showing data from {format_timestamp(result.fetched_at)}.")
 
-        # ===== DATABASE STUFF (separate, safe) =====
+        # ===== DATABASE STUFF (queued, written by database.writer) =====
         try:
-            database.add_recent(
+            database.queue_recent(
                 current_data.get("name", city),
-                int(round(current_data["main"]["temp"]))
+                int(round(current_data["main"]["temp"])),
+                current_data.get("id"),
             )
         except Exception as e:
-            print("Recent log error:", e)
+            eventlog.error("recent_log_failed", e, city=city)
 
         if self.current_user:
             try:
-                database.log_user_search(
+                database.queue_search_log(
                     self.current_user,
                     current_data.get("name", city),
                     int(round(current_data["main"]["temp"]))
                 )
             except Exception as e:
-                print("User log error:", e)
+                eventlog.error("search_log_failed", e, city=city)
+
+    def shown_city(self):
+        """(name, city ID or None) of the city on screen, or None."""
+        city = getattr(self, "_last_city", None)
+        return (city, getattr(self, "_last_city_id", None)) if city else None
+
+    def on_auto_refresh(self, result):
+        # a search in flight or a different city on screen wins over the refresh;
+        # compared by ID where known, since names repeat (Paris, FR / Paris, US)
+        shown = self.shown_city()
+        if self.fetcher.busy or shown is None:
+            return
+        name, city_id = shown
+        if (result.current.get("id") != city_id if city_id is not None
+                else result.current.get("name") != name):
+            return
+        self.error_label.configure(text="")
+        self.update_ui_with_data(result.current, result.forecast)
+
+    def on_weather_error(self, e, city=None, started=None):
+        import requests
+
+        eventlog.warning("search_failed", city=city, error=eventlog.error_text(e), error_type=type(e).__name__,
+                         duration_ms=None if started is None
+                         else round((time.perf_counter() - started) * 1000, 3))
 
+        if isinstance(e, weather_api.RateLimited):
+            self.city_label.configure(text=getattr(self, "_last_city", None) or "Welcome")
+            self.error_label.configure(
+                text=f"Too many requests. Try again in {max(1, round(e.retry_after))} s.")
+            return
+
+        if isinstance(e, weather_api.CircuitOpen):
+            self.city_label.configure(text=getattr(self, "_last_city", None) or "Welcome")
+            self.error_label.configure(
+                text=f"Weather service unavailable. Try again in {max(1, round(e.retry_after))} s.")
+            return
+
+        if isinstance(e, requests.exceptions.HTTPError) and e.response is not None \
+                and e.response.status_code >= 500:
+            self.city_label.configure(text=getattr(self, "_last_city", None) or "Welcome")
+            self.error_label.configure(text="Weather service error. Try again later.")
+            return
+
+        if isinstance(e, requests.exceptions.HTTPError):
+            self.city_label.configure(text="Not found")
+            # offer the closest names from the local city table
+            with perf.span("cities.fuzzy"):
+                close = city_index.fuzzy(city) if city else []
+            if close:
+                self.error_label.configure(text=f"City not found. Did you mean {close[0].label}?")
+                self.suggestions = close
+                self.suggest_index = 0
+                self.show_suggestions()
+            else:
+                self.error_label.configure(text="City not found. Check spelling.")
+            return
+
+        self.error_label.configure(text="Network error. Try again.")
+
+    @perf.timed("ui.update_weather")
     def update_ui_with_data(self, current, forecast):
         city_name = current.get("name", "Unknown")
         temp = current.get("main", {}).get("temp")
@@ -1078,45 +1758,37 @@ class WeatherApp(ctk.CTk):
         except Exception:
             pass
 
-        # hourly
-        for widget in self.hourly_container.winfo_children():
-            widget.destroy()
-        hours = forecast.get("list", [])[:7]
-        hr_frame = ctk.CTkFrame(self.hourly_container, corner_radius=8)
-        hr_frame.pack(fill="x", padx=6, pady=8)
-        for hr in hours:
-            dt_txt = hr.get("dt_txt", "")
-            tstr = dt_txt.split(" ")[1][:5] if dt_txt else ""
-            temp_h = int(round(hr.get("main", {}).get("temp", 0)))
-            w = hr.get("weather", [{}])[0]
-            iconn = map_weather_to_icon(w.get("main", ""), w.get("id"))
+        # forecast arrays, parsed once; kept for anything else that plots or compares it
+        from forecast_series import ForecastSeries
+        series = ForecastSeries.from_payload(forecast)
+        self.forecast_series = series
+
+        # hourly (cells are built once in build_main_ui, only reconfigured here);
+        # labels, temperatures and icons all come from the same time-sorted arrays
+        hour_count = min(len(self.hourly_widgets), len(series))
+        hour_labels = series.hour_labels(hour_count)
+        for i, (time_lbl, icon_lbl, temp_lbl) in enumerate(self.hourly_widgets):
+            if i >= hour_count:
+                time_lbl.configure(text="")
+                icon_lbl.configure(text="", image=None)
+                icon_lbl.image = None
+                temp_lbl.configure(text="")
+                continue
+            temp_h = "--" if math.isnan(series.temp[i]) else int(round(series.temp[i]))
+            cond = str(series.condition[i])
+            iconn = map_weather_to_icon(cond, int(series.condition_id[i]))
             ic = self.get_cached_icon(iconn, size=(40, 40))
-            cell = ctk.CTkFrame(hr_frame, corner_radius=8, width=110, height=120)
-            cell.pack(side="left", padx=10, pady=6)
-            cell.pack_propagate(False)
-            ctk.CTkLabel(cell, text=tstr, font=("Arial", 11)).pack(padx=6, pady=(6, 2))
+            time_lbl.configure(text=hour_labels[i])
             if ic:
-                lbl = ctk.CTkLabel(cell, image=ic, text="")
-                lbl.image = ic
-                lbl.pack()
+                icon_lbl.configure(image=ic, text="")
+                icon_lbl.image = ic
             else:
-                ctk.CTkLabel(cell, text=w.get("main", "")).pack()
-            ctk.CTkLabel(cell, text=f"{temp_h}°", font=("Arial", 12, "bold")).pack(pady=(4, 8))
-
-        # 5 day with icons
-        days = {}
-        conditions = {}
-        for item in forecast.get("list", []):
-            date = item.get("dt_txt", "").split(" ")[0]
-            if not date:
-                continue
-            if date not in days:
-                days[date] = []
-            days[date].append(item.get("main", {}).get("temp", 0))
-            if date not in conditions:
-                conditions[date] = item.get("weather", [{}])[0].get("main", "").lower()
+                icon_lbl.configure(image=None, text=cond.title())
+                icon_lbl.image = None
+            temp_lbl.configure(text=f"{temp_h}°")
 
-        day_items = list(days.items())[:5]
+        # 5 day with icons (local days, dominant condition)
+        day_items = series.daily(5)
 
         for label, icon_lbl, temp_lbl in self.days_widgets:
             label.configure(text="")
@@ -1127,17 +1799,16 @@ class WeatherApp(ctk.CTk):
                 pass
             temp_lbl.configure(text="")
 
-        for i, (day, temps) in enumerate(day_items):
+        for i, day in enumerate(day_items):
             label, icon_lbl, temp_lbl = self.days_widgets[i]
 
-            dt = datetime.strptime(day, "%Y-%m-%d")
-            label.configure(text=dt.strftime("%a"))
+            label.configure(text=day.date.strftime("%a"))
 
-            tmax = int(round(max(temps))) if temps else 0
-            tmin = int(round(min(temps))) if temps else 0
+            tmax = "--" if math.isnan(day.temp_max) else int(round(day.temp_max))
+            tmin = "--" if math.isnan(day.temp_min) else int(round(day.temp_min))
             temp_lbl.configure(text=f"{tmax}° / {tmin}°")
 
-            cond = conditions.get(day, "clouds")
+            cond = day.condition or "clouds"
             icon_file = map_weather_to_icon(cond)
             icon_img = self.get_cached_icon(icon_file, size=(32, 32))
             if icon_img:
@@ -1148,18 +1819,12 @@ class WeatherApp(ctk.CTk):
 
         # remember last search for favorites and settings
         self._last_city = city_name
+        self._last_city_id = current.get("id")
         self._last_condition = main
         self._last_temp = int(round(temp)) if temp is not None else None
 
     def get_cached_icon(self, filename, size=(64, 64)):
-        key = f"{filename}_{size[0]}x{size[1]}"
-        if key in self.icon_cache:
-            return self.icon_cache[key]
-        img = load_icon(filename, size=size)
-        if img:
-            self.icon_cache[key] = img
-            return img
-        return None
+        return self.icon_cache.get(filename, size=size)
 
     # Favorites / Recents windows (kept separate)
     def open_favorites_window(self):
@@ -1171,24 +1836,37 @@ class WeatherApp(ctk.CTk):
 
             ctk.CTkLabel(win, text="⭐ Favorite Cities", font=("Arial", 18, "bold")).pack(pady=(12, 6))
 
-            fav_frame = ctk.CTkScrollableFrame(win)
-            fav_frame.pack(fill="both", expand=True, padx=12, pady=12)
-
-            favs = database.get_favorites()
-            if not favs:
-                ctk.CTkLabel(fav_frame, text="No favorites yet").pack(padx=8, pady=8)
-            else:
-                for city, temp, cond, date in favs:
-                    row = ctk.CTkFrame(fav_frame)
-                    row.pack(fill="x", pady=6, padx=6)
-                    ctk.CTkLabel(row, text=city, anchor="w").pack(side="left", padx=6)
-                    ctk.CTkLabel(row, text=f"{temp}°", anchor="e").pack(side="left", padx=6)
-                    open_btn = ctk.CTkButton(row, text="Open", width=60, command=lambda c=city: (self.search_from_recents(c), win.destroy()))
-                    open_btn.pack(side="right", padx=4)
-                    remove_btn = ctk.CTkButton(row, text="Remove", width=70, command=lambda c=city: (database.remove_favorite(c), win.destroy(), self.open_favorites_window()))
-                    remove_btn.pack(side="right", padx=4)
+            def make_row(parent):
+                row = ctk.CTkFrame(parent, height=40)
+                row.pack_propagate(False)
+                row.icon_lbl = ctk.CTkLabel(row, text="", width=28)
+                row.icon_lbl.pack(side="left", padx=(6, 0))
+                row.city_lbl = ctk.CTkLabel(row, text="", anchor="w")
+                row.city_lbl.pack(side="left", padx=6)
+                row.temp_lbl = ctk.CTkLabel(row, text="", anchor="e")
+                row.temp_lbl.pack(side="left", padx=6)
+                row.open_btn = ctk.CTkButton(row, text="Open", width=60)
+                row.open_btn.pack(side="right", padx=4)
+                row.remove_btn = ctk.CTkButton(row, text="Remove", width=70)
+                row.remove_btn.pack(side="right", padx=4)
+                return row
+
+            def bind_row(row, fav):
+                city, temp, cond, date, city_id = fav
+                icon = self.get_cached_icon(map_weather_to_icon(cond), size=(24, 24))
+                row.icon_lbl.configure(image=icon, text="")
+                row.icon_lbl.image = icon
+                row.city_lbl.configure(text=city)
+                row.temp_lbl.configure(text=f"{temp}°")
+                row.open_btn.configure(command=lambda c=city, i=city_id: (self.search_from_recents(c, i), win.destroy()))
+                row.remove_btn.configure(command=lambda c=city: (database.remove_favorite(c), win.destroy(), self.open_favorites_window()))
+
+            fav_list = VirtualList(win, make_row=make_row, bind_row=bind_row,
+                                   empty_text="No favorites yet", row_padx=6, row_pady=6)
+            fav_list.pack(fill="both", expand=True, padx=12, pady=12)
+            fav_list.set_items(database.get_favorites())
         except Exception as e:
-            print("Open favorites window error:", e)
+            eventlog.error("favorites_window_failed", e)
 
     def open_recents_window(self):
         try:
@@ -1199,29 +1877,36 @@ class WeatherApp(ctk.CTk):
 
             ctk.CTkLabel(win, text="🕒 Recent Searches", font=("Arial", 18, "bold")).pack(pady=(12, 6))
 
-            rec_frame = ctk.CTkScrollableFrame(win)
-            rec_frame.pack(fill="both", expand=True, padx=12, pady=12)
-
-            recs = database.get_recents(20)
-            if not recs:
-                ctk.CTkLabel(rec_frame, text="No recents yet").pack(padx=8, pady=8)
-            else:
-                for _id, city, temp, time in recs:
-                    row = ctk.CTkFrame(rec_frame)
-                    row.pack(fill="x", pady=6, padx=6)
-                    ctk.CTkLabel(row, text=city, anchor="w").pack(side="left", padx=6)
-                    ctk.CTkLabel(row, text=f"{temp}°", anchor="e").pack(side="left", padx=6)
-                    btn_research = ctk.CTkButton(row, text="Open", width=80, command=lambda c=city: (win.destroy(), self.search_from_recents(c)))
-                    btn_research.pack(side="right", padx=6)
+            def make_row(parent):
+                row = ctk.CTkFrame(parent, height=40)
+                row.pack_propagate(False)
+                row.city_lbl = ctk.CTkLabel(row, text="", anchor="w")
+                row.city_lbl.pack(side="left", padx=6)
+                row.temp_lbl = ctk.CTkLabel(row, text="", anchor="e")
+                row.temp_lbl.pack(side="left", padx=6)
+                row.open_btn = ctk.CTkButton(row, text="Open", width=80)
+                row.open_btn.pack(side="right", padx=6)
+                return row
+
+            def bind_row(row, rec):
+                _id, city, temp, time, city_id = rec
+                row.city_lbl.configure(text=city)
+                row.temp_lbl.configure(text=f"{temp}°")
+                row.open_btn.configure(command=lambda c=city, i=city_id: (win.destroy(), self.search_from_recents(c, i)))
+
+            rec_list = VirtualList(win, make_row=make_row, bind_row=bind_row,
+                                   empty_text="No recents yet", row_padx=6, row_pady=6)
+            rec_list.pack(fill="both", expand=True, padx=12, pady=12)
+            rec_list.set_items(database.get_recents(20))
 
             ctk.CTkButton(win, text="Clear Recents", command=lambda: (database.clear_recents(), win.destroy(), self.open_recents_window())).pack(pady=10)
         except Exception as e:
-            print("Open recents window error:", e)
+            eventlog.error("recents_window_failed", e)
 
-    def search_from_recents(self, city_name):
+    def search_from_recents(self, city_name, city_id=None):
         self.search_entry.delete(0, "end")
         self.search_entry.insert(0, city_name)
-        self.search_and_update()
+        self.search_and_update(city_id)
 
     # Favorites toggle
     def toggle_favorite(self):
@@ -1233,10 +1918,11 @@ class WeatherApp(ctk.CTk):
                 database.remove_favorite(city)
                 self.favorite_btn.configure(text="☆")
             else:
-                database.add_favorite(city, self._last_temp or 0, self._last_condition or "")
+                database.add_favorite(city, self._last_temp or 0, self._last_condition or "",
+                                      getattr(self, "_last_city_id", None))
                 self.favorite_btn.configure(text="★")
         except Exception as e:
-            print("Favorite toggle error:", e)
+            eventlog.error("favorite_toggle_failed", e, city=getattr(self, "_last_city", None))
 
     # ---------------- Settings screen integration ----------------
     def show_settings(self):
@@ -1278,12 +1964,16 @@ class WeatherApp(ctk.CTk):
     # ----------------- helper to rebuild main UI if needed -----------------
     def rebuild_main(self):
         # helper to rebuild UI when toggles/settings change
+        self.fetcher.cancel()  # pending results would target destroyed widgets
         if self.main_frame:
             self.main_frame.destroy()
             self.build_main_ui()
 
     def logout_user(self):
         self.current_user = None
+        self.fetcher.cancel()
+        self.refresher.stop()
+        self.offline_sync.stop()
         # hide main UI
         try:
             self.main_frame.pack_forget()
@@ -1294,6 +1984,16 @@ class WeatherApp(ctk.CTk):
         self.welcome = WelcomeScreen(self.container, self)
         self.welcome.pack(fill="both", expand=True)
 
+    def on_close(self):
+        self.refresher.stop()
+        self.offline_sync.stop()
+        self.fetcher.shutdown()
+        weather_api.close_session()
+        database.writer.shutdown()  # flush queued recents/logs
+        database.close_connection()
+        eventlog.shutdown()
+        self.destroy()
+
 
 # ----------------- SettingsScreen (keeps and hooks into database.save_settings) -----------------
 
@@ -1327,6 +2027,17 @@ class SettingsScreen(ctk.CTkFrame):
         self.bg_var = ctk.BooleanVar(value=self.app.settings.get("dynamic_bg", True))
         ctk.CTkSwitch(bg_frame, text="On / Off", variable=self.bg_var, command=self.toggle_bg).pack(side="right", padx=10)
 
+        # Auto refresh (shown city + favorites)
+        refresh_frame = ctk.CTkFrame(self, corner_radius=12)
+        refresh_frame.pack(pady=10, padx=40, fill="x")
+        ctk.CTkLabel(refresh_frame, text="Auto Refresh").pack(side="left", padx=10)
+
+        minutes = self.app.settings.get("refresh_minutes", 15)
+        current = next((k for k, v in REFRESH_CHOICES.items() if v == minutes), f"{minutes} min")
+        self.refresh_var = ctk.StringVar(value=current)
+        ctk.CTkOptionMenu(refresh_frame, values=list(REFRESH_CHOICES), variable=self.refresh_var,
+                          command=self.set_refresh).pack(side="right", padx=10)
+
         # Clear buttons
         clear_frame = ctk.CTkFrame(self, corner_radius=12)
         clear_frame.pack(pady=20, padx=40, fill="x")
@@ -1348,12 +2059,16 @@ class SettingsScreen(ctk.CTkFrame):
         new_unit = self.unit_var.get()
         self.app.temp_unit = new_unit
         database.save_settings(new_unit, self.bg_var.get())
-        self.app.settings = database.get_settings()
+        self.app.load_settings()
         self.app.rebuild_main()
 
+    def set_refresh(self, choice):
+        database.save_settings(self.unit_var.get(), self.bg_var.get(), REFRESH_CHOICES[choice])
+        self.app.load_settings()
+
     def toggle_bg(self):
         database.save_settings(self.unit_var.get(), self.bg_var.get())
-        self.app.settings = database.get_settings()
+        self.app.load_settings()
         self.app.rebuild_main()
 
     def clear_recents(self):
@@ -1365,7 +2080,30 @@ class SettingsScreen(ctk.CTkFrame):
 
 
 
+def profile_startup(app, built_at):
+    """Print how long startup took once the first frame is on screen, then quit."""
+    def report():
+        app.update_idletasks()
+        painted = time.perf_counter()
+        total_ms = (painted - _START) * 1000
+        print(f"Startup profile (target {STARTUP_TARGET_MS} ms):")
+        print(f"  imports       {(_IMPORTS_DONE - _START) * 1000:8.1f} ms")
+        print(f"  window built  {(built_at - _IMPORTS_DONE) * 1000:8.1f} ms")
+        print(f"  first paint   {(painted - built_at) * 1000:8.1f} ms")
+        print(f"  total         {total_ms:8.1f} ms  {'OK' if total_ms <= STARTUP_TARGET_MS else 'OVER TARGET'}")
+        app.exit_code = 0 if total_ms <= STARTUP_TARGET_MS else 1
+        app.on_close()
+
+    app.after_idle(report)
+
+
 if __name__ == "__main__":
+    if perf.METRICS_PORT:
+        print("Metrics at", perf.serve_metrics())
     app = WeatherApp()
+    app.exit_code = 0
+    if "--profile-startup" in sys.argv:
+        profile_startup(app, time.perf_counter())
     app.mainloop()
+    sys.exit(app.exit_code)
 
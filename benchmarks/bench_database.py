@@ -0,0 +1,207 @@
+# bench_database.py
+"""
+Benchmarks database.py at realistic volumes.
+
+A scratch database (never weather.db) is seeded with users, search logs and
+favorites, then each operation is called repeatedly and its latency
+summarized the way pytest-benchmark does (min/mean/stddev/p50/p95/p99 and
+ops/s). Seeding 5M logs takes a while, so --db keeps the seeded file for
+the next run:
+
+    python benchmarks/bench_database.py --db /tmp/weatherly-5m.db
+    python benchmarks/bench_database.py --users 1000 --logs 200000   # quick run
+
+get_logs_for_user("") reads every log row into memory (several GB at 5M
+rows); skip it with --skip-all-logs.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import common
+
+import database
+
+CITIES = [
+    "London", "Paris", "Madrid", "Berlin", "Rome", "Lisbon", "Oslo", "Dublin", "Vienna",
+    "Prague", "Warsaw", "Athens", "Cairo", "Lagos", "Nairobi", "Accra", "Tokyo", "Seoul",
+    "Delhi", "Mumbai", "Dhaka", "Jakarta", "Manila", "Sydney", "Auckland", "Lima",
+    "Bogota", "Santiago", "Toronto", "Chicago", "New York", "Mexico City",
+]
+SEED_BATCH = 100_000
+PASSWORD = database.hash_pw("benchmark")
+
+
+def username(i):
+    return f"user{i:06d}"
+
+
+def seeded_counts():
+    """What seed() put in the database; live counts for one it didn't seed (all 0 if new)."""
+    c = database.get_connection().cursor()
+    if c.execute("SELECT 1 FROM sqlite_master WHERE name = 'bench_seed'").fetchone():
+        users, logs, favorites = c.execute(
+            "SELECT users, logs, favorites FROM bench_seed").fetchone()
+        return {"users": users, "logs": logs, "favorites": favorites}
+    return {
+        # the baseline schema adds an admin account; only count seeded users
+        "users": c.execute("SELECT COUNT(*) FROM users WHERE password = ?",
+                           (PASSWORD,)).fetchone()[0],
+        "logs": c.execute("SELECT COUNT(*) FROM logs").fetchone()[0],
+        "favorites": c.execute("SELECT COUNT(*) FROM favorites").fetchone()[0],
+    }
+
+
+def seed(users, logs, favorites, seed_value):
+    rnd = random.Random(seed_value)
+    now = int(time.time())
+    year = 365 * 24 * 3600
+
+    with database.transaction() as c:
+        c.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, 'user')",
+                      ((username(i), PASSWORD) for i in range(users)))
+        c.executemany("""
+            INSERT INTO favorites (city, last_temp, condition, date_added, city_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((f"Favorite {i}", rnd.randint(-10, 35), "Clouds", now - rnd.randrange(year), i)
+              for i in range(favorites)))
+
+    done = 0
+    while done < logs:
+        batch = min(SEED_BATCH, logs - done)
+        with database.transaction() as c:
+            c.executemany("INSERT INTO logs (username, timestamp, city, temp) VALUES (?, ?, ?, ?)",
+                          ((username(rnd.randrange(users)), now - rnd.randrange(year),
+                            rnd.choice(CITIES), rnd.randint(-10, 35)) for _ in range(batch)))
+        done += batch
+        print(f"  seeded {done:,}/{logs:,} logs", end="\r", flush=True)
+    print()
+    with database.transaction() as c:
+        # recorded so a reused --db is recognised even after rows were added to it
+        c.execute("CREATE TABLE bench_seed (users INTEGER, logs INTEGER, favorites INTEGER)")
+        c.execute("INSERT INTO bench_seed VALUES (?, ?, ?)", (users, logs, favorites))
+    database.get_connection().execute("ANALYZE")
+
+
+def last_log_id():
+    return database.get_connection().execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+
+
+def drop_logs_after(log_id):
+    """Delete the rows the write benchmarks added, so --db keeps the seeded volume."""
+    database.writer.flush(120)
+    with database.transaction() as c:
+        c.execute("DELETE FROM logs WHERE id > ?", (log_id,))
+
+
+def bench(fn, rounds, make_args=lambda: ()):
+    """Call fn(*make_args()) rounds times; latency summary plus ops/s."""
+    samples = []
+    for _ in range(rounds):
+        args = make_args()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    result = common.summarize(samples)
+    total = sum(samples)
+    result["ops_per_s"] = round(rounds / total, 1) if total else None
+    return result
+
+
+def throughput(fn, rows, make_args):
+    """
+    Rows per second for rows back-to-back calls, plus a final flush that
+    commits whatever is still queued.
+    """
+    start = time.perf_counter()
+    for i in range(rows):
+        fn(*make_args(i))
+    database.writer.flush(120)
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(rows / elapsed, 1) if elapsed else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database.py at scale")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--logs", type=int, default=5_000_000)
+    parser.add_argument("--favorites", type=int, default=1_000)
+    parser.add_argument("--rounds", type=int, default=200, help="calls per timed operation")
+    parser.add_argument("--write-rows", type=int, default=2_000, help="rows per throughput test")
+    parser.add_argument("--skip-all-logs", action="store_true",
+                        help="skip get_logs_for_user for all users")
+    parser.add_argument("--db", help="seeded database to reuse (created if missing)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.db:
+        db_path = os.path.abspath(args.db)
+    else:
+        tmp = tempfile.mkdtemp(prefix="weatherly-bench-")
+        db_path = os.path.join(tmp, "bench.db")
+    if os.path.abspath(database.DB_FILE) == db_path:
+        parser.error("refusing to benchmark the app's own database")
+    database.DB_FILE = db_path
+    database.init_db()
+
+    rnd = random.Random(args.seed)
+    results = {}
+    try:
+        counts = seeded_counts()
+        wanted = {"users": args.users, "logs": args.logs, "favorites": args.favorites}
+        if counts != wanted:
+            if any(counts.values()):
+                parser.error(f"{db_path} holds {counts}, not {wanted}; use another --db")
+            print(f"Seeding {db_path} ...")
+            elapsed, _ = common.timed(seed, args.users, args.logs, args.favorites, args.seed)
+            results["seed_s"] = round(elapsed, 1)
+        # WAL mode: fold freshly seeded pages into the main file before measuring it
+        database.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        results["db_size_mb"] = round(os.path.getsize(db_path) / 2 ** 20, 1)
+
+        def random_user():
+            return (username(rnd.randrange(args.users)),)
+
+        results["verify_user"] = bench(database.verify_user, args.rounds,
+                                       lambda: (random_user()[0], PASSWORD))
+        results["verify_user_wrong_password"] = bench(database.verify_user, args.rounds,
+                                                      lambda: (random_user()[0], "x"))
+        results["get_logs_for_user"] = bench(database.get_logs_for_user, args.rounds, random_user)
+        results["get_logs_page_first"] = bench(database.get_logs_page, args.rounds, random_user)
+        if not args.skip_all_logs:
+            results["get_logs_for_user_all"] = bench(database.get_logs_for_user, 1, lambda: ("",))
+        results["get_logs_page_all_first"] = bench(database.get_logs_page, args.rounds,
+                                                   lambda: ("",))
+        results["get_favorites"] = bench(database.get_favorites, args.rounds)
+        results["add_recent"] = bench(database.add_recent, args.rounds,
+                                      lambda: (rnd.choice(CITIES), rnd.randint(-10, 35)))
+
+        seeded_last_log = last_log_id()
+        try:
+            results["log_user_search"] = throughput(
+                database.log_user_search, args.write_rows,
+                lambda i: (username(i % args.users), rnd.choice(CITIES), i % 40))
+            results["queue_search_log"] = throughput(
+                database.queue_search_log, args.write_rows,
+                lambda i: (username(i % args.users), rnd.choice(CITIES), i % 40))
+        finally:
+            drop_logs_after(seeded_last_log)
+    finally:
+        database.writer.shutdown()
+        database.close_connection()
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    config = dict(vars(args), sqlite=database.sqlite3.sqlite_version)
+    common.print_table(results)
+    print("Results written to", common.write_results("database", config, results, args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# bench_fetch.py
+"""
+Benchmarks the fetch path behind search_and_update against the local mock
+server (mock_owm.py), with a throwaway database so weather.db is untouched.
+
+Measures:
+  - search latency (p50/p95/p99) cold, warm from memory and warm from disk
+  - auto-refresh throughput with concurrent fetch_current calls and with
+    batched fetch_group calls
+  - cache hit ratios (lookups answered without a network request)
+  - DB write cost of the cache, search log and favorites updates
+
+    python benchmarks/bench_fetch.py --cities 50 --latency-ms 30 --error-rate 0.01
+
+The app's rate limiter is lifted for the run (the mock has no quota);
+pass --rate-limit to keep it.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+import mock_owm
+
+
+def _network_requests(server):
+    return server.options.requests if server is not None else None
+
+
+def run_searches(weather_api, cities, label, server):
+    """Sequential fetch_weather calls, like a user searching one city after another."""
+    stats_before = weather_api.response_cache.stats()
+    requests_before = _network_requests(server)
+    samples, errors = [], 0
+    for city in cities:
+        start = time.perf_counter()
+        try:
+            weather_api.fetch_weather(city, "metric")
+        except Exception as e:
+            errors += 1
+            print(f"{label} error for {city}:", e)
+            continue
+        samples.append(time.perf_counter() - start)
+
+    stats = weather_api.response_cache.stats()
+    lookups = 2 * len(cities)  # current + forecast per search
+    result = {
+        "latency": common.summarize(samples),
+        "errors": errors,
+        "memory_hits": stats["hits"] - stats_before["hits"],
+        "memory_misses": stats["misses"] - stats_before["misses"],
+    }
+    if server is not None:
+        network = server.options.requests - requests_before
+        result["network_requests"] = network
+        result["cache_hit_ratio"] = round(max(0, lookups - network) / lookups, 4) if lookups else None
+    return result
+
+
+def expire_caches(weather_api, database):
+    weather_api.response_cache.clear()
+    with database.transaction() as c:
+        c.execute("UPDATE http_cache SET expires_at = 0")
+
+
+def run_refresh(weather_api, cities, concurrency):
+    """Concurrent fetch_current calls, the way AutoRefresher refreshes favorites by name."""
+    samples, errors = [], 0
+
+    def one(city):
+        return common.timed(weather_api.fetch_current, city, "metric", None,
+                            weather_api.BACKGROUND)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(one, city) for city in cities]
+        for future in futures:
+            try:
+                samples.append(future.result()[0])
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "latency": common.summarize(samples),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "cities_per_s": round(len(samples) / elapsed, 2) if elapsed else None,
+    }
+
+
+def run_group_refresh(weather_api, city_ids):
+    """The same refresh through the batched /group endpoint, as used for favorites with an ID."""
+    elapsed, results = common.timed(weather_api.fetch_group, city_ids, "metric")
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "cities": len(results),
+        "missing": len(city_ids) - len(results),
+        "cities_per_s": round(len(results) / elapsed, 2) if elapsed else None,
+    }
+
+
+def run_db_writes(database, rows):
+    payload = '{"name": "Bench", "main": {"temp": 1}}' * 20
+    now = time.time()
+
+    cache_samples = []
+    for i in range(rows):
+        cache_samples.append(common.timed(
+            database.save_cached_response, "weather", f"bench {i}", "metric", payload,
+            None, None, now, now + 600)[0])
+
+    # search logs go through the write-behind queue; cost is queueing + one flush
+    start = time.perf_counter()
+    for i in range(rows):
+        database.queue_search_log("bench", f"City {i}", i % 40)
+    queued = time.perf_counter() - start
+    flush, _ = common.timed(database.writer.flush, 60)
+
+    for i in range(100):
+        database.add_favorite(f"Fav {i}", 0, "Clear")
+    updates = [(f"Fav {i}", i % 40, "Clouds") for i in range(100)]
+    favorites, _ = common.timed(database.update_favorites_weather, updates)
+
+    return {
+        "save_cached_response": common.summarize(cache_samples),
+        "queue_search_log_us_per_row": round(queued / rows * 1e6, 3),
+        "writer_flush_ms": round(flush * 1000, 3),
+        "search_log_total_us_per_row": round((queued + flush) / rows * 1e6, 3),
+        "update_favorites_weather_100_ms": round(favorites * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Weatherly fetch path")
+    parser.add_argument("--cities", type=int, default=50, help="distinct cities searched")
+    parser.add_argument("--refresh-cities", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="refresh threads (default: weather_api.REFRESH_CONCURRENCY)")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--forecast-entries", type=int, default=40)
+    parser.add_argument("--padding-bytes", type=int, default=0)
+    parser.add_argument("--db-rows", type=int, default=1000, help="rows per DB write test")
+    parser.add_argument("--base", help="use an already running mock at this base URL")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the app's rate limiter")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    server = None
+    base = args.base
+    if base is None:
+        server, base = mock_owm.start_server(
+            latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+            forecast_entries=args.forecast_entries, padding_bytes=args.padding_bytes,
+            seed=args.seed)
+    os.environ["WEATHERLY_API_BASE"] = base  # read when weather_api is imported
+
+    tmp = tempfile.mkdtemp(prefix="weatherly-bench-")
+    import database
+    database.DB_FILE = os.path.join(tmp, "bench.db")
+    import weather_api
+
+    if not args.rate_limit:
+        weather_api.limiter = weather_api.RateLimiter(rate_per_min=10 ** 9, burst=10 ** 6)
+    concurrency = args.concurrency or weather_api.REFRESH_CONCURRENCY
+    database.init_db()
+
+    cities = [f"Benchcity {i}" for i in range(args.cities)]
+    refresh_cities = [f"Refreshcity {i}" for i in range(args.refresh_cities)]
+    results = {}
+    try:
+        print(f"Mock API at {base}, database in {tmp}")
+        results["search_cold"] = run_searches(weather_api, cities, "cold", server)
+        results["search_warm_memory"] = run_searches(weather_api, cities, "memory", server)
+        weather_api.response_cache.clear()
+        results["search_warm_disk"] = run_searches(weather_api, cities, "disk", server)
+
+        # prime, then expire, so the refresh measures real requests
+        run_refresh(weather_api, refresh_cities, concurrency)
+        expire_caches(weather_api, database)
+        results["refresh_by_name"] = run_refresh(weather_api, refresh_cities, concurrency)
+        results["refresh_group"] = run_group_refresh(
+            weather_api, [mock_owm._city_id(c) for c in refresh_cities])
+
+        results["db_writes"] = run_db_writes(database, args.db_rows)
+        results["response_cache"] = weather_api.response_cache.stats()
+        if server is not None:
+            results["mock_requests"] = server.options.requests
+            results["mock_injected_errors"] = server.options.errors
+    finally:
+        database.writer.shutdown()
+        database.close_connection()
+        weather_api.close_session()
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    config = dict(vars(args), concurrency=concurrency, base=base)
+    common.print_table(results)
+    print("Results written to", common.write_results("fetch", config, results, args.out))
+
+
+if __name__ == "__main__":
+    main()
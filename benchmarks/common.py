@@ -0,0 +1,96 @@
+# common.py
+"""Helpers shared by the benchmark scripts: timing summaries and JSON output."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# the app modules live one level up
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds of a list of durations in seconds."""
+    values = sorted(s * 1000 for s in samples)
+    if not values:
+        return {"n": 0}
+    mean = sum(values) / len(values)
+    return {
+        "n": len(values),
+        "min_ms": round(values[0], 3),
+        "mean_ms": round(mean, 3),
+        "stddev_ms": round((sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5, 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """(duration in seconds, result) of one call."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def write_results(name, config, results, out=None):
+    """
+    Save one run as JSON and return the path.
+
+    Default location is benchmarks/results/<name>-<revision>-<time>.json, so
+    runs from different versions sit next to each other for comparison.
+    """
+    revision = git_revision()
+    document = {
+        "benchmark": name,
+        "revision": revision,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{name}-{revision or 'unknown'}-{stamp}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    return out
+
+
+def print_table(results):
+    for name, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            print(f"  {name:<28} n={value['n']:<6} p50={value['p50_ms']:>9.3f}ms "
+                  f"p95={value['p95_ms']:>9.3f}ms p99={value['p99_ms']:>9.3f}ms")
+        elif isinstance(value, dict):
+            print(f"  {name}:")
+            print_table({f"  {k}": v for k, v in value.items()})
+        else:
+            print(f"  {name:<28} {value}")
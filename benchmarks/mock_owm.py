@@ -0,0 +1,201 @@
+# mock_owm.py
+"""
+Local stand-in for the OpenWeatherMap endpoints Weatherly uses
+(/weather, /forecast and /group), for benchmarks and offline testing.
+
+Run it and point the app at it:
+    python benchmarks/mock_owm.py --port 8000 --latency-ms 80 --error-rate 0.02
+    WEATHERLY_API_BASE=http://127.0.0.1:8000/data/2.5 python Weatherly.py
+
+Responses have the same shape as the real API but made-up values. City
+names are accepted as-is (any q= resolves), except "nowhere", which gives
+a 404 like an unknown city does.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONDITIONS = [
+    (800, "Clear", "clear sky"),
+    (803, "Clouds", "broken clouds"),
+    (500, "Rain", "light rain"),
+    (601, "Snow", "snow"),
+    (211, "Thunderstorm", "thunderstorm"),
+    (741, "Fog", "fog"),
+]
+
+
+class MockOptions:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, forecast_entries=40,
+                 padding_bytes=0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.forecast_entries = forecast_entries  # 3-hourly entries, 40 = 5 days
+        self.padding_bytes = padding_bytes        # extra bytes per response, to test payload size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+
+def _city_id(name):
+    return zlib.crc32(name.casefold().encode()) % 9_000_000 + 1_000_000
+
+
+def _current(name, city_id, units, now):
+    rnd = random.Random(city_id)
+    code, main, desc = rnd.choice(CONDITIONS)
+    temp = rnd.uniform(-10, 35) if units == "metric" else rnd.uniform(14, 95)
+    return {
+        "id": city_id,
+        "name": name,
+        "dt": now,
+        "timezone": rnd.choice([-18000, 0, 3600, 19800, 32400]),
+        "coord": {"lon": round(rnd.uniform(-180, 180), 4), "lat": round(rnd.uniform(-90, 90), 4)},
+        "weather": [{"id": code, "main": main, "description": desc, "icon": "01d"}],
+        "main": {"temp": round(temp, 2), "feels_like": round(temp - 1.5, 2),
+                 "temp_min": round(temp - 2, 2), "temp_max": round(temp + 2, 2),
+                 "pressure": rnd.randint(990, 1030), "humidity": rnd.randint(20, 100)},
+        "wind": {"speed": round(rnd.uniform(0, 15), 2), "deg": rnd.randint(0, 359)},
+        "clouds": {"all": rnd.randint(0, 100)},
+        "sys": {"country": "XX"},
+        "cod": 200,
+    }
+
+
+def _forecast(name, city_id, units, now, entries):
+    rnd = random.Random(city_id)
+    base = rnd.uniform(-10, 35) if units == "metric" else rnd.uniform(14, 95)
+    start = now - now % 10800 + 10800
+    items = []
+    for i in range(entries):
+        code, main, desc = rnd.choice(CONDITIONS)
+        temp = base + rnd.uniform(-4, 4)
+        item = {
+            "dt": start + i * 10800,
+            "main": {"temp": round(temp, 2), "feels_like": round(temp - 1.5, 2),
+                     "temp_min": round(temp - 1, 2), "temp_max": round(temp + 1, 2),
+                     "pressure": rnd.randint(990, 1030), "humidity": rnd.randint(20, 100)},
+            "weather": [{"id": code, "main": main, "description": desc, "icon": "01d"}],
+            "wind": {"speed": round(rnd.uniform(0, 15), 2), "deg": rnd.randint(0, 359)},
+            "pop": round(rnd.random(), 2),
+            "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + i * 10800)),
+        }
+        if main == "Rain":
+            item["rain"] = {"3h": round(rnd.uniform(0.1, 5), 2)}
+        elif main == "Snow":
+            item["snow"] = {"3h": round(rnd.uniform(0.1, 5), 2)}
+        items.append(item)
+    return {
+        "cod": "200",
+        "cnt": entries,
+        "list": items,
+        "city": {"id": city_id, "name": name, "country": "XX",
+                 "timezone": _current(name, city_id, units, now)["timezone"]},
+    }
+
+
+def make_handler(options):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+
+            with options.lock:
+                options.requests += 1
+                delay = max(0.0, options.random.gauss(options.latency_ms, options.jitter_ms))
+                failed = options.random.random() < options.error_rate
+                if failed:
+                    options.errors += 1
+            if delay:
+                time.sleep(delay / 1000)
+            if failed:
+                return self._send(500, {"cod": 500, "message": "injected error"})
+
+            units = query.get("units", "standard")
+            now = int(time.time())
+            if endpoint == "group":
+                ids = [int(i) for i in query.get("id", "").split(",") if i.strip()]
+                items = [_current(f"City {i}", i, units, now) for i in ids]
+                return self._send(200, {"cnt": len(items), "list": items})
+            if endpoint not in ("weather", "forecast"):
+                return self._send(404, {"cod": 404, "message": "unknown endpoint"})
+
+            if "id" in query:
+                city_id = int(query["id"])
+                name = f"City {city_id}"
+            else:
+                name = query.get("q", "").split(",")[0].strip().title()
+                if not name or name.casefold() == "nowhere":
+                    return self._send(404, {"cod": "404", "message": "city not found"})
+                city_id = _city_id(name)
+
+            if endpoint == "weather":
+                payload = _current(name, city_id, units, now)
+            else:
+                payload = _forecast(name, city_id, units, now, options.forecast_entries)
+            self._send(200, payload)
+
+        def _send(self, status, payload):
+            if options.padding_bytes:
+                payload["_padding"] = "x" * options.padding_bytes
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # one line per request would drown out benchmark output
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Start the mock in a daemon thread; returns (server, base_url). port=0 picks a free port."""
+    opts = MockOptions(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(opts))
+    server.daemon_threads = True
+    server.options = opts
+    threading.Thread(target=server.serve_forever, name="mock-owm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/data/2.5"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenWeatherMap server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="latency std deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--forecast-entries", type=int, default=40)
+    parser.add_argument("--padding-bytes", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, base = start_server(args.host, args.port, latency_ms=args.latency_ms,
+                                jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                                forecast_entries=args.forecast_entries,
+                                padding_bytes=args.padding_bytes, seed=args.seed)
+    print(f"Mock OpenWeatherMap on {base} (Ctrl+C to stop)")
+    print(f"  WEATHERLY_API_BASE={base}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
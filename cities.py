@@ -0,0 +1,375 @@
+# cities.py
+"""
+Local city table: type-ahead suggestions, name -> OpenWeatherMap city ID
+resolution and "did you mean" lookups.
+
+The source data is OpenWeatherMap's city list dump
+(https://bulk.openweathermap.org/sample/city.list.json.gz). It is not
+bundled; put it in data/ as city.list.json.gz (or unpacked as
+city.list.json). It is compiled once into data/cities.bin, a compact binary
+table that later starts are memory-mapped from instead of parsing ~200k
+JSON objects:
+
+    python cities.py build                      # data/city.list.json.gz -> data/cities.bin
+    python cities.py build other.json.gz -o x.bin
+
+Without either file the index stays empty and the search box simply shows
+no suggestions.
+"""
+import argparse
+import bisect
+import difflib
+import gzip
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+import eventlog
+from weather_api import normalize_city
+
+# ---------- CONFIG ----------
+DATA_DIR = "data"
+CITY_LIST_FILES = [os.path.join(DATA_DIR, "city.list.json.gz"),
+                   os.path.join(DATA_DIR, "city.list.json")]
+TABLE_FILE = os.path.join(DATA_DIR, "cities.bin")
+SUGGEST_LIMIT = 8
+SUGGEST_SCAN_MAX = 2000  # entries looked at per query when filtering by country/state
+FUZZY_SCAN_MAX = 20000   # candidate names compared by fuzzy()
+FUZZY_CUTOFF = 0.75      # difflib similarity a fuzzy match needs
+# -----------------------------
+
+# cities.bin layout (little endian):
+#   header   magic, version, count, offset of id index, offset of strings
+#   records  count x RECORD, sorted by (key, country, state)
+#   id index count x ID_ENTRY (city id, record number), sorted by city id
+#   strings  UTF-8 keys, names and states referenced by (offset, length)
+# Keys are normalize_city(name) in UTF-8, whose byte order matches code
+# point order, so prefix searches compare raw bytes without decoding.
+MAGIC = b"WCTY"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIII")
+RECORD = struct.Struct("<IffIHIHIB2s")  # id, lat, lon, key, name, state (off/len), country
+ID_ENTRY = struct.Struct("<II")
+
+
+class City(NamedTuple):
+    id: int
+    name: str
+    state: str
+    country: str
+    lat: float
+    lon: float
+
+    @property
+    def label(self) -> str:
+        """What the suggestion list shows, e.g. "Portland, OR, US"."""
+        return ", ".join(part for part in (self.name, self.state, self.country) if part)
+
+
+def _split_query(text):
+    # "paris, fr" -> ("paris", ["fr"]): a name plus optional state/country parts
+    parts = [normalize_city(part) for part in text.split(",")]
+    return parts[0], [p for p in parts[1:] if p]
+
+
+# ===========================
+# Binary Table
+# ===========================
+def build_table(records) -> bytes:
+    """Compile city.list.json records into the cities.bin format."""
+    rows = []
+    for r in records:
+        key = normalize_city(r["name"]).encode()
+        rows.append((key, r.get("country") or "", r.get("state") or "", r))
+    rows.sort(key=lambda row: row[:3])
+
+    records_blob = bytearray()
+    strings = bytearray()
+    for key, country, state, r in rows:
+        name = r["name"].encode()
+        state = state.encode()
+        coord = r.get("coord") or {}
+        key_at = len(strings)
+        strings += key
+        name_at = len(strings)
+        strings += name
+        state_at = len(strings)
+        strings += state
+        records_blob += RECORD.pack(int(r["id"]), float(coord.get("lat", 0.0)),
+                                    float(coord.get("lon", 0.0)), key_at, len(key),
+                                    name_at, len(name), state_at, len(state),
+                                    country.encode()[:2].ljust(2))
+
+    id_index = b"".join(ID_ENTRY.pack(city_id, n) for city_id, n in
+                        sorted((int(row[3]["id"]), n) for n, row in enumerate(rows)))
+    ids_at = HEADER.size + len(records_blob)
+    strings_at = ids_at + len(id_index)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(rows), ids_at, strings_at)
+    return b"".join((header, records_blob, id_index, strings))
+
+
+def read_city_list(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_table(source, out=TABLE_FILE):
+    """Build out from a city list file; written to a temp file first so readers never see half of it."""
+    data = build_table(read_city_list(source))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    tmp = out + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out)
+    return out
+
+
+class _Column:
+    # read-only sequence view so bisect can search the table in place
+    def __init__(self, length, getter):
+        self._length = length
+        self._getter = getter
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        return self._getter(i)
+
+
+class CityTable:
+    """Read-only view over a cities.bin buffer (an mmap, or bytes built in memory)."""
+
+    def __init__(self, buf):
+        if len(buf) < HEADER.size:
+            raise ValueError("truncated city table")
+        magic, version, self.count, self._ids_at, self._strings_at = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a Weatherly city table (or an older format)")
+        if (self._ids_at != HEADER.size + self.count * RECORD.size or
+                self._strings_at != self._ids_at + self.count * ID_ENTRY.size or
+                len(buf) < self._strings_at):
+            raise ValueError("truncated city table")
+        if self.count:
+            # strings are written in record order, so the last record's state ends the file
+            last = RECORD.unpack_from(buf, self._ids_at - RECORD.size)
+            if len(buf) < self._strings_at + last[7] + last[8]:
+                raise ValueError("truncated city table")
+        self.buf = buf
+        self.keys = _Column(self.count, self.key)
+        self._ids = _Column(self.count, lambda n: ID_ENTRY.unpack_from(buf, self._ids_at + n * ID_ENTRY.size)[0])
+
+    def _string(self, offset, length):
+        start = self._strings_at + offset
+        return self.buf[start:start + length]
+
+    def key(self, n) -> bytes:
+        rec = RECORD.unpack_from(self.buf, HEADER.size + n * RECORD.size)
+        return self._string(rec[3], rec[4])
+
+    def city(self, n) -> City:
+        (city_id, lat, lon, _key_at, _key_len, name_at, name_len,
+         state_at, state_len, country) = RECORD.unpack_from(self.buf, HEADER.size + n * RECORD.size)
+        return City(city_id, self._string(name_at, name_len).decode(),
+                    self._string(state_at, state_len).decode(),
+                    country.decode().strip(), round(lat, 4), round(lon, 4))
+
+    def find_id(self, city_id) -> Optional[int]:
+        i = bisect.bisect_left(self._ids, city_id)
+        if i < self.count and self._ids[i] == city_id:
+            return ID_ENTRY.unpack_from(self.buf, self._ids_at + i * ID_ENTRY.size)[1]
+        return None
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+
+def _map_table(path) -> CityTable:
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return CityTable(buf)
+    except BaseException:
+        buf.close()
+        raise
+
+
+# ===========================
+# Index
+# ===========================
+class CityIndex:
+    """
+    Name lookups over a CityTable.
+
+    Records are sorted by normalized (whitespace-collapsed, case-folded)
+    name, so every name starting with a prefix is one contiguous range found
+    with two binary searches: a suggestion costs O(log n + limit) and reads
+    only the pages it touches from the mapped file.
+    """
+
+    def __init__(self):
+        self._table = None
+        self.loaded = False
+
+    def __len__(self):
+        return self._table.count if self._table is not None else 0
+
+    # ----- loading -----
+    def load(self, table_path=TABLE_FILE, sources=None) -> bool:
+        """
+        Map table_path, (re)building it first from the newest city list file
+        if it is missing, older or unreadable (e.g. truncated). If data/ isn't
+        writable the table is built in memory instead.
+        """
+        start = time.perf_counter()
+        source = next((p for p in sources or CITY_LIST_FILES if os.path.exists(p)), None)
+        try:
+            if source is None or (os.path.exists(table_path) and
+                                  os.path.getmtime(table_path) >= os.path.getmtime(source)):
+                if not os.path.exists(table_path):
+                    return False
+                try:
+                    self._set_table(_map_table(table_path), table_path, start)
+                    return True
+                except (ValueError, struct.error) as e:
+                    if source is None:
+                        raise
+                    eventlog.warning("city_table_unreadable", path=table_path, error=str(e))
+            try:
+                write_table(source, table_path)
+            except OSError as e:
+                eventlog.warning("city_table_write_failed", path=table_path, error=str(e))
+                self._set_table(CityTable(build_table(read_city_list(source))), source, start)
+                return True
+            self._set_table(_map_table(table_path), table_path, start)
+            return True
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            eventlog.error("city_index_load_failed", e, path=source or table_path)
+            return False
+
+    def _set_table(self, table, path, start):
+        # the old table isn't closed here: a query on the Tk thread may still be
+        # reading it, and its mmap is released once the last reference goes
+        self._table = table
+        self.loaded = True
+        eventlog.event("city_index_loaded", path=path, cities=table.count,
+                       duration_ms=round((time.perf_counter() - start) * 1000, 1))
+
+    def load_in_background(self):
+        threading.Thread(target=self.load, name="weatherly-cities", daemon=True).start()
+
+    # ----- queries -----
+    @staticmethod
+    def _range(table, prefix: bytes):
+        # 0xff never occurs in UTF-8, so prefix + b"\xff" sorts after every key with that prefix
+        return (bisect.bisect_left(table.keys, prefix),
+                bisect.bisect_left(table.keys, prefix + b"\xff"))
+
+    def suggest(self, text, limit=SUGGEST_LIMIT) -> List[City]:
+        """
+        Cities whose name starts with text, exact names first. Extra
+        comma-separated parts ("Paris, FR", "Portland, OR") narrow the
+        result down by state or country.
+        """
+        table = self._table
+        prefix, filters = _split_query(text)
+        if table is None or not prefix:
+            return []
+        lo, hi = self._range(table, prefix.encode())
+        if not filters:
+            return [table.city(n) for n in range(lo, min(hi, lo + limit))]
+
+        found = []
+        for n in range(lo, min(hi, lo + SUGGEST_SCAN_MAX)):
+            city = table.city(n)
+            if all(_matches(city, part) for part in filters):
+                found.append(city)
+                if len(found) == limit:
+                    break
+        return found
+
+    def find(self, text, exact=False) -> List[City]:
+        """
+        Cities named text. Case-folded by default ("paris" finds "Paris");
+        exact=True also requires the name's case and spacing to match.
+        """
+        table = self._table
+        name, filters = _split_query(text)
+        if table is None or not name:
+            return []
+        key = name.encode()
+        lo = bisect.bisect_left(table.keys, key)
+        hi = bisect.bisect_right(table.keys, key, lo)
+        wanted = text.split(",")[0].strip()
+        return [c for c in (table.city(n) for n in range(lo, hi))
+                if (not exact or c.name == wanted) and
+                all(normalize_city(c.country) == part or normalize_city(c.state) == part
+                    for part in filters)]
+
+    def resolve(self, text) -> Optional[City]:
+        """The one city text names (a name or a full label), or None if none or several."""
+        matches = self.find(text)
+        return matches[0] if len(matches) == 1 else None
+
+    def fuzzy(self, text, limit=5, cutoff=FUZZY_CUTOFF) -> List[City]:
+        """
+        Closest names to a misspelt text ("Lodnon" -> London), best first.
+        Candidates share the first letter (the first two if that range is
+        larger than FUZZY_SCAN_MAX) and are ranked with difflib.
+        """
+        table = self._table
+        name, _filters = _split_query(text)
+        if table is None or not name:
+            return []
+        for width in (1, 2):
+            lo, hi = self._range(table, name[:width].encode())
+            if hi - lo <= FUZZY_SCAN_MAX:
+                break
+        first = {}  # candidate name -> first record with it
+        for n in range(lo, min(hi, lo + FUZZY_SCAN_MAX)):
+            first.setdefault(table.key(n), n)
+        candidates = {key.decode(): n for key, n in first.items()}
+        best = difflib.get_close_matches(name, candidates, n=limit, cutoff=cutoff)
+        return [table.city(candidates[key]) for key in best]
+
+    def get(self, city_id) -> Optional[City]:
+        table = self._table
+        n = table.find_id(city_id) if table is not None else None
+        return table.city(n) if n is not None else None
+
+
+def _matches(city, part):
+    return (normalize_city(city.country).startswith(part) or
+            normalize_city(city.state).startswith(part))
+
+
+city_index = CityIndex()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weatherly city table tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="compile an OpenWeatherMap city list into cities.bin")
+    build.add_argument("source", nargs="?", help="city.list.json(.gz) (default: first one in data/)")
+    build.add_argument("-o", "--out", default=TABLE_FILE)
+    args = parser.parse_args()
+
+    source = args.source or next((p for p in CITY_LIST_FILES if os.path.exists(p)), None)
+    if source is None:
+        parser.error("no city list found; download city.list.json.gz into data/")
+    start = time.perf_counter()
+    out = write_table(source, args.out)
+    with open(out, "rb") as f:
+        table = CityTable(f.read())
+    print(f"{out}: {table.count} cities, {os.path.getsize(out) / 2 ** 20:.1f} MB, "
+          f"built in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
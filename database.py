@@ -1,11 +1,107 @@
+import atexit
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Tuple
 import hashlib
-import os
+
+import eventlog
+import perf
 
 DB_FILE = "weather.db"
 
+CACHE_SIZE_KB = 8192  # page cache per connection
+RECENTS_LIMIT = 20
+LOGS_PAGE_SIZE = 100
+
+FLUSH_INTERVAL_MS = 250  # write-behind: max time a queued row waits
+FLUSH_MAX_ROWS = 100     # write-behind: max rows per transaction
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()  # DB files already checked against SCHEMA_VERSION
+
+
+# ===========================
+# Connections
+# ===========================
+def _connect(path):
+    # autocommit mode: transactions are opened explicitly by transaction()
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return this thread's connection to DB_FILE, opening it on first use.
+
+    Connections are reused for the life of the thread instead of being opened
+    and torn down on every call. If DB_FILE is changed the old connection is
+    closed and a new one opened. The first connection to a file also brings
+    its schema up to date, so init_db() doesn't have to run before first use.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_FILE:
+        if conn is not None:
+            conn.close()
+        conn = _connect(DB_FILE)
+        _local.conn = conn
+        _local.path = DB_FILE
+        _local.depth = 0
+        _ensure_schema(DB_FILE)
+    return conn
+
+
+def _ensure_schema(path):
+    if path in _schema_ready:
+        return
+    # other threads wait here until the first one has finished migrating
+    with _schema_lock:
+        if path not in _schema_ready:
+            migrate()
+            _schema_ready.add(path)
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
+    """
+    Run a block of writes as one transaction on this thread's connection.
+
+        with transaction() as c:
+            c.execute(...)
+
+    Commits on success and rolls back on error. Nested blocks join the
+    outermost transaction.
+    """
+    conn = get_connection()
+    if _local.depth == 0:
+        conn.execute("BEGIN IMMEDIATE")
+    _local.depth += 1
+    try:
+        yield conn.cursor()
+    except BaseException:
+        _local.depth -= 1
+        if _local.depth == 0:
+            conn.execute("ROLLBACK")
+        raise
+    _local.depth -= 1
+    if _local.depth == 0:
+        conn.execute("COMMIT")
+
 
 # ===========================
 # Password Hash
@@ -18,9 +114,18 @@ def hash_pw(password: str) -> str:
 # Initialize DB
 # ===========================
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    migrate()
+
+
+# ===========================
+# Schema Migrations
+# ===========================
+# Each migration runs once, in order, inside its own transaction. The schema
+# version is kept in PRAGMA user_version, so an up-to-date database costs a
+# single PRAGMA read. Append new migrations; never edit shipped ones.
 
+def _migration_1(c):
+    """Baseline schema."""
     # ----- Favorites -----
     c.execute("""
     CREATE TABLE IF NOT EXISTS favorites (
@@ -59,138 +164,274 @@ def init_db():
     )
     """)
 
-    # ----- Search Logs (correct table name) -----
+    # ----- Search Logs -----
     c.execute("""
     CREATE TABLE IF NOT EXISTS logs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT,
         timestamp TEXT,
         city TEXT,
-        temp INTEGER,
-        timestamp TEXT
+        temp INTEGER
     )
     """)
 
-    conn.commit()
-    conn.close()
+    # ----- HTTP response cache (see weather_api) -----
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS http_cache (
+        endpoint TEXT NOT NULL,
+        city_key TEXT NOT NULL,
+        units TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        fetched_at REAL NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (endpoint, city_key, units)
+    )
+    """)
 
     # Settings table must exist too
     create_settings_table()
 
 
+def _migration_2(c):
+    """Unix-time INTEGER timestamps for logs/favorites, plus indexes."""
+    c.execute("""
+    CREATE TABLE logs_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        timestamp INTEGER NOT NULL,
+        city TEXT,
+        temp INTEGER
+    )
+    """)
+    c.execute("""
+        INSERT INTO logs_new (id, username, timestamp, city, temp)
+        SELECT id, username, COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), 0), city, temp
+        FROM logs
+    """)
+    c.execute("DROP TABLE logs")
+    c.execute("ALTER TABLE logs_new RENAME TO logs")
+
+    c.execute("""
+    CREATE TABLE favorites_new (
+        city TEXT PRIMARY KEY,
+        last_temp INTEGER,
+        condition TEXT,
+        date_added INTEGER NOT NULL
+    )
+    """)
+    c.execute("""
+        INSERT INTO favorites_new (city, last_temp, condition, date_added)
+        SELECT city, last_temp, condition, COALESCE(CAST(strftime('%s', date_added) AS INTEGER), 0)
+        FROM favorites
+    """)
+    c.execute("DROP TABLE favorites")
+    c.execute("ALTER TABLE favorites_new RENAME TO favorites")
+
+    c.execute("CREATE INDEX idx_logs_username_timestamp ON logs (username, timestamp)")
+    c.execute("CREATE INDEX idx_logs_timestamp ON logs (timestamp)")
+    c.execute("CREATE INDEX idx_favorites_date_added ON favorites (date_added)")
+
+
+def _migration_3(c):
+    """Auto-refresh interval setting (0 = off)."""
+    c.execute("ALTER TABLE settings ADD COLUMN refresh_minutes INTEGER NOT NULL DEFAULT 15")
+
+
+def _migration_4(c):
+    """Resolved OpenWeatherMap city IDs for favorites (for batched refresh)."""
+    c.execute("ALTER TABLE favorites ADD COLUMN city_id INTEGER")
+
+
+def _migration_5(c):
+    """Per-day API call counters (see weather_api.RateLimiter)."""
+    c.execute("""
+    CREATE TABLE api_usage (
+        day TEXT PRIMARY KEY,
+        calls INTEGER NOT NULL DEFAULT 0,
+        throttled INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+
+def _migration_6(c):
+    """OpenWeatherMap city IDs for recents, so reopening one fetches the same city."""
+    c.execute("ALTER TABLE recents ADD COLUMN city_id INTEGER")
+
+
+def _migration_7(c):
+    """Unix-time INTEGER timestamps for recents, like logs and favorites."""
+    c.execute("""
+    CREATE TABLE recents_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT,
+        last_temp INTEGER,
+        time_searched INTEGER NOT NULL,
+        city_id INTEGER
+    )
+    """)
+    c.execute("""
+        INSERT INTO recents_new (id, city, last_temp, time_searched, city_id)
+        SELECT id, city, last_temp, COALESCE(CAST(strftime('%s', time_searched) AS INTEGER), 0), city_id
+        FROM recents
+    """)
+    c.execute("DROP TABLE recents")
+    c.execute("ALTER TABLE recents_new RENAME TO recents")
+
+
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version() -> int:
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate():
+    """Bring DB_FILE up to SCHEMA_VERSION."""
+    if get_schema_version() >= SCHEMA_VERSION:
+        return
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        with transaction() as c:
+            # re-read under the write lock in case another process got here first
+            if c.execute("PRAGMA user_version").fetchone()[0] >= number:
+                continue
+            migration(c)
+            c.execute(f"PRAGMA user_version = {number}")
+
+
 # ===========================
 # Favorites
 # ===========================
-def add_favorite(city: str, last_temp: int, condition: str):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    now = datetime.utcnow().isoformat()
-    c.execute("""
-    INSERT OR REPLACE INTO favorites (city, last_temp, condition, date_added)
-    VALUES (?, ?, ?, ?)
-    """, (city, last_temp, condition, now))
-    conn.commit()
-    conn.close()
+def add_favorite(city: str, last_temp: int, condition: str, city_id: int = None):
+    now = int(time.time())
+    with transaction() as c:
+        c.execute("""
+        INSERT OR REPLACE INTO favorites (city, last_temp, condition, date_added, city_id)
+        VALUES (?, ?, ?, ?, ?)
+        """, (city, last_temp, condition, now, city_id))
 
 
 def remove_favorite(city: str):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM favorites WHERE city = ?", (city,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("DELETE FROM favorites WHERE city = ?", (city,))
 
 
-def get_favorites() -> List[Tuple[str, int, str, str]]:
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT city, last_temp, condition, date_added FROM favorites ORDER BY date_added DESC")
-    rows = c.fetchall()
-    conn.close()
-    return rows
+def is_favorite(city: str) -> bool:
+    c = get_connection().cursor()
+    c.execute("SELECT 1 FROM favorites WHERE city = ?", (city,))
+    return c.fetchone() is not None
+
+
+def update_favorites_weather(rows):
+    """rows: [(city, last_temp, condition), ...] from a background refresh."""
+    with transaction() as c:
+        c.executemany("UPDATE favorites SET last_temp = ?, condition = ? WHERE city = ?",
+                      [(temp, condition, city) for city, temp, condition in rows])
+
+
+def set_favorite_city_ids(rows):
+    """rows: [(city, city_id), ...]"""
+    with transaction() as c:
+        c.executemany("UPDATE favorites SET city_id = ? WHERE city = ?",
+                      [(city_id, city) for city, city_id in rows])
+
+
+def get_favorite_ids() -> List[Tuple[str, int]]:
+    c = get_connection().cursor()
+    c.execute("SELECT city, city_id FROM favorites ORDER BY date_added DESC")
+    return c.fetchall()
+
+
+def get_favorites() -> List[Tuple[str, int, str, str, int]]:
+    c = get_connection().cursor()
+    c.execute("SELECT city, last_temp, condition, date_added, city_id FROM favorites "
+              "ORDER BY date_added DESC")
+    return c.fetchall()
 
 
 # ===========================
 # Recents
 # ===========================
-def add_recent(city: str, last_temp: int):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    now = datetime.utcnow().isoformat()
-    c.execute("INSERT INTO recents (city, last_temp, time_searched) VALUES (?, ?, ?)",
-              (city, last_temp, now))
-    conn.commit()
-
-    # Keep only last 20 entries
-    c.execute("SELECT id FROM recents ORDER BY id DESC LIMIT -1 OFFSET 20")
-    excess = c.fetchall()
-    if excess:
-        ids = [(row[0],) for row in excess]
-        c.executemany("DELETE FROM recents WHERE id = ?", ids)
-        conn.commit()
-
-    conn.close()
-
-
-def get_recents(limit: int = 20) -> List[Tuple[int, str, int, str]]:
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id, city, last_temp, time_searched FROM recents ORDER BY id DESC LIMIT ?",
-              (limit,))
-    rows = c.fetchall()
-    conn.close()
-    return rows
+def _insert_recent(c, city, last_temp, time_searched, city_id=None):
+    c.execute("INSERT INTO recents (city, last_temp, time_searched, city_id) VALUES (?, ?, ?, ?)",
+              (city, last_temp, time_searched, city_id))
+
+
+def _trim_recents(c):
+    # Keep only the last RECENTS_LIMIT entries
+    c.execute("""
+        DELETE FROM recents
+        WHERE id <= (SELECT id FROM recents ORDER BY id DESC LIMIT 1 OFFSET ?)
+    """, (RECENTS_LIMIT,))
+
+
+def add_recent(city: str, last_temp: int, city_id: int = None):
+    now = int(time.time())
+    with transaction() as c:
+        _insert_recent(c, city, last_temp, now, city_id)
+        _trim_recents(c)
+
+
+def queue_recent(city: str, last_temp: int, city_id: int = None):
+    """Like add_recent, but written later by the write-behind thread."""
+    writer.submit(_insert_recent, city, last_temp, int(time.time()), city_id)
+
+
+def get_recents(limit: int = 20) -> List[Tuple[int, str, int, int, int]]:
+    c = get_connection().cursor()
+    c.execute("SELECT id, city, last_temp, time_searched, city_id FROM recents "
+              "ORDER BY id DESC LIMIT ?", (limit,))
+    return c.fetchall()
 
 
 def clear_recents():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM recents")
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("DELETE FROM recents")
 
 
 # ===========================
 # Settings
 # ===========================
 def create_settings_table():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS settings (
-        id INTEGER PRIMARY KEY,
-        unit TEXT,
-        dynamic_bg INTEGER
-    )
-    """)
-
-    # Create if none exists
-    if c.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 0:
-        c.execute("INSERT INTO settings (unit, dynamic_bg) VALUES (?, ?)", ("C", 1))
+    with transaction() as c:
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY,
+            unit TEXT,
+            dynamic_bg INTEGER
+        )
+        """)
 
-    conn.commit()
-    conn.close()
+        # Create if none exists
+        if c.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 0:
+            c.execute("INSERT INTO settings (unit, dynamic_bg) VALUES (?, ?)", ("C", 1))
 
 
 def get_settings():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT unit, dynamic_bg FROM settings WHERE id = 1")
+    c = get_connection().cursor()
+    c.execute("SELECT unit, dynamic_bg, refresh_minutes FROM settings WHERE id = 1")
     row = c.fetchone()
-    conn.close()
     if row:
-        return {"unit": row[0], "dynamic_bg": bool(row[1])}
-    return {"unit": "C", "dynamic_bg": True}
+        return {"unit": row[0], "dynamic_bg": bool(row[1]), "refresh_minutes": row[2]}
+    return {"unit": "C", "dynamic_bg": True, "refresh_minutes": 15}
 
 
-def save_settings(unit, dynamic_bg):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("UPDATE settings SET unit=?, dynamic_bg=? WHERE id=1",
-              (unit, 1 if dynamic_bg else 0))
-    conn.commit()
-    conn.close()
+def save_settings(unit, dynamic_bg, refresh_minutes=None):
+    with transaction() as c:
+        c.execute("UPDATE settings SET unit=?, dynamic_bg=? WHERE id=1",
+                  (unit, 1 if dynamic_bg else 0))
+        if refresh_minutes is not None:
+            c.execute("UPDATE settings SET refresh_minutes=? WHERE id=1", (refresh_minutes,))
 
 
 # ===========================
@@ -198,96 +439,294 @@ def save_settings(unit, dynamic_bg):
 # ===========================
 def add_user(username, password_hash, role="user"):
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-        INSERT INTO users (username, password, role)
-        VALUES (?, ?, ?)
-        """, (username, password_hash, role))
-        conn.commit()
+        with transaction() as c:
+            c.execute("""
+            INSERT INTO users (username, password, role)
+            VALUES (?, ?, ?)
+            """, (username, password_hash, role))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 
 def verify_user(username, password_hash):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute("SELECT role FROM users WHERE username=? AND password=?", (username, password_hash))
     row = c.fetchone()
-    conn.close()
     return row[0] if row else None
 
 
 def get_all_users():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute("SELECT username, role FROM users")
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    return c.fetchall()
 
 
 def get_user_count():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute("SELECT COUNT(*) FROM users")
-    total = c.fetchone()[0]
-    conn.close()
-    return total
+    return c.fetchone()[0]
 
 
 def delete_user(username):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM users WHERE username=?", (username,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("DELETE FROM users WHERE username=?", (username,))
 
 
 def get_user_info(username):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = get_connection().cursor()
     c.execute("SELECT username, role FROM users WHERE username=?", (username,))
     row = c.fetchone()
-    conn.close()
     return {"username": row[0], "role": row[1]} if row else {}
 
 
 # ===========================
-# SEARCH LOGGING (correct version)
+# HTTP Response Cache
 # ===========================
-def log_user_search(username, city, temp):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+def get_cached_response(endpoint, city_key, units):
+    c = get_connection().cursor()
+    c.execute("""
+        SELECT payload, etag, last_modified, fetched_at, expires_at
+        FROM http_cache
+        WHERE endpoint = ? AND city_key = ? AND units = ?
+    """, (endpoint, city_key, units))
+    row = c.fetchone()
+    if not row:
+        return None
+    return {"payload": row[0], "etag": row[1], "last_modified": row[2],
+            "fetched_at": row[3], "expires_at": row[4]}
+
+
+def save_cached_response(endpoint, city_key, units, payload, etag, last_modified,
+                         fetched_at, expires_at):
+    with transaction() as c:
+        c.execute("""
+            INSERT OR REPLACE INTO http_cache
+                (endpoint, city_key, units, payload, etag, last_modified, fetched_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (endpoint, city_key, units, payload, etag, last_modified, fetched_at, expires_at))
+
+
+def refresh_cached_response(endpoint, city_key, units, fetched_at, expires_at):
+    # a 304 revalidation: payload unchanged, just push the expiry out
+    with transaction() as c:
+        c.execute("""
+            UPDATE http_cache SET fetched_at = ?, expires_at = ?
+            WHERE endpoint = ? AND city_key = ? AND units = ?
+        """, (fetched_at, expires_at, endpoint, city_key, units))
+
+
+def prune_http_cache(expired_before):
+    with transaction() as c:
+        c.execute("DELETE FROM http_cache WHERE expires_at < ?", (expired_before,))
+        return c.rowcount
+
+
+# ===========================
+# API Usage
+# ===========================
+def _bump_api_usage(c, day, throttled):
+    c.execute("""
+        INSERT INTO api_usage (day, calls, throttled) VALUES (?, 1, ?)
+        ON CONFLICT (day) DO UPDATE SET calls = calls + 1, throttled = throttled + excluded.throttled
+    """, (day, 1 if throttled else 0))
+
 
+def queue_api_call(throttled=False):
+    """Count one outbound API call for today (UTC), via the write-behind thread."""
+    writer.submit(_bump_api_usage, datetime.utcnow().strftime("%Y-%m-%d"), throttled)
+
+
+def get_api_usage(days: int = 7) -> List[Tuple[str, int, int]]:
+    """[(day, calls, throttled), ...] newest first."""
+    c = get_connection().cursor()
+    c.execute("SELECT day, calls, throttled FROM api_usage ORDER BY day DESC LIMIT ?", (days,))
+    return c.fetchall()
+
+
+# ===========================
+# SEARCH LOGGING (correct version)
+# ===========================
+def _insert_log(c, username, timestamp, city, temp):
     c.execute("""
         INSERT INTO logs (username, timestamp, city, temp)
         VALUES (?, ?, ?, ?)
     """, (username, timestamp, city, temp))
 
-    conn.commit()
-    conn.close()
+
+def log_user_search(username, city, temp):
+    with transaction() as c:
+        _insert_log(c, username, int(time.time()), city, temp)
+
+
+def queue_search_log(username, city, temp):
+    """Like log_user_search, but written later by the write-behind thread."""
+    writer.submit(_insert_log, username, int(time.time()), city, temp)
 
 
 def get_logs_for_user(username):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    # timestamps are stored as unix time; format them for display
+    c = get_connection().cursor()
 
     if username:
         c.execute("""
-            SELECT timestamp, city, temp
+            SELECT strftime('%Y-%m-%d %H:%M:%S', timestamp, 'unixepoch'), city, temp
             FROM logs
             WHERE username = ?
             ORDER BY timestamp DESC
         """, (username,))
     else:
-        c.execute("SELECT timestamp, city, temp FROM logs ORDER BY timestamp DESC")
+        c.execute("""
+            SELECT strftime('%Y-%m-%d %H:%M:%S', timestamp, 'unixepoch'), city, temp
+            FROM logs
+            ORDER BY timestamp DESC
+        """)
 
-    rows = c.fetchall()
-    conn.close()
-    return rows
-print("USING DATABASE AT:", os.path.abspath(DB_FILE))
\ No newline at end of file
+    return c.fetchall()
+
+
+def get_logs_page(username, after_timestamp=None, after_id=None, limit=LOGS_PAGE_SIZE):
+    """
+    One page of search logs, newest first, as (id, timestamp, city, temp) rows.
+
+    Pass the timestamp and id of the previous page's last row to get the next
+    page. The (timestamp, id) cursor walks the index directly, so every page
+    costs the same no matter how deep into the history it is. An empty
+    username pages through all users.
+    """
+    where = []
+    params = []
+    if username:
+        where.append("username = ?")
+        params.append(username)
+    if after_timestamp is not None:
+        where.append("(timestamp, id) < (?, ?)")
+        params.extend([after_timestamp, after_id if after_id is not None else -1])
+    sql = "SELECT id, timestamp, city, temp FROM logs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit)
+
+    c = get_connection().cursor()
+    c.execute(sql, params)
+    return c.fetchall()
+
+
+# ===========================
+# Write-Behind Queue
+# ===========================
+class WriteBehind:
+    """
+    Background writer for small, fire-and-forget inserts.
+
+    Operations are queued from any thread and applied by one writer thread,
+    which commits them in a single transaction every FLUSH_INTERVAL_MS or
+    FLUSH_MAX_ROWS rows, whichever comes first. Callers never wait on a
+    commit unless they ask to with flush().
+    """
+
+    _STOP = object()
+
+    def __init__(self, flush_ms=FLUSH_INTERVAL_MS, max_rows=FLUSH_MAX_ROWS):
+        self.flush_ms = flush_ms
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, op, *args):
+        """Queue op(cursor, *args) to run inside the next batch."""
+        self._ensure_started()
+        self._queue.put((op, args))
+
+    def flush(self, timeout=None) -> bool:
+        """Block until everything queued so far has been committed."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def shutdown(self, timeout=5):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="weatherly-db-writer",
+                                                    daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_ms / 1000
+            # a flush() or shutdown() marker ends the batch right away instead of at the deadline
+            while (len(batch) < self.max_rows and batch[-1] is not self._STOP
+                   and not isinstance(batch[-1], threading.Event)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            ops = [item for item in batch if isinstance(item, tuple)]
+            if ops:
+                self._write(ops)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is self._STOP:
+                    stopping = True
+        close_connection()
+
+    def _write(self, ops):
+        try:
+            with perf.span("db.write_behind_batch"), transaction() as c:
+                self._apply(c, ops)
+        except Exception as e:
+            # one bad row must not take the rest of the batch down with it
+            eventlog.error("write_behind_batch_failed", e, rows=len(ops))
+            for op in ops:
+                try:
+                    with transaction() as c:
+                        self._apply(c, [op])
+                except Exception as e:
+                    eventlog.error("write_behind_failed", e, op=op[0].__name__)
+
+    @staticmethod
+    def _apply(c, ops):
+        for op, args in ops:
+            op(c, *args)
+        if any(op is _insert_recent for op, _args in ops):
+            _trim_recents(c)
+
+
+writer = WriteBehind()
+atexit.register(writer.shutdown)
+
+
+# ===========================
+# Instrumentation
+# ===========================
+# every public call is timed as "db.<name>" (see perf.py)
+perf.instrument(globals(), "db", [
+    "migrate",
+    "add_favorite", "remove_favorite", "is_favorite", "update_favorites_weather",
+    "set_favorite_city_ids", "get_favorite_ids", "get_favorites",
+    "add_recent", "get_recents", "clear_recents",
+    "get_settings", "save_settings",
+    "add_user", "verify_user", "get_all_users", "get_user_count", "delete_user", "get_user_info",
+    "get_cached_response", "save_cached_response", "refresh_cached_response", "prune_http_cache",
+    "get_api_usage",
+    "log_user_search", "get_logs_for_user", "get_logs_page",
+])
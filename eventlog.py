@@ -0,0 +1,135 @@
+# eventlog.py
+"""
+Structured event log, written as JSON lines without blocking the caller.
+
+    eventlog.event("search", city="Oslo", duration_ms=12.5, stale=False)
+    eventlog.error("favorite_toggle_failed", e, city="Oslo")
+
+Records go through a logging.QueueHandler, so the calling thread (usually
+the Tk main thread) only pays for a queue put. A QueueListener thread
+writes them to LOG_DIR/LOG_FILE, rotated by size. Every line carries the
+logged-in user (set_user). Warnings and errors are also echoed to stderr.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+from datetime import datetime, timezone
+
+# ---------- CONFIG ----------
+LOG_DIR = os.environ.get("WEATHERLY_LOG_DIR", "logs")
+LOG_FILE = "weatherly.log"
+LOG_MAX_BYTES = 5 * 1024 * 1024  # rotate at this size
+LOG_BACKUPS = 5                  # rotated files kept (weatherly.log.1 ... .5)
+CONSOLE_LEVEL = logging.WARNING
+# -----------------------------
+
+# requests puts the full URL, API key included, into its exception messages
+_SECRET_PARAM = re.compile(r"(\bappid=)[^&\s'\"]+", re.IGNORECASE)
+
+logger = logging.getLogger("weatherly")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+_context = {"user": None}
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, event, user, thread, then the event's fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            "user": getattr(record, "user", None),
+            "thread": record.threadName,
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        return f"[{record.levelname.lower()}] {record.getMessage()} {fields}".rstrip()
+
+
+def setup():
+    """Start the writer thread (done on the first event; safe to call again)."""
+    global _listener
+    if _listener is not None:
+        return
+    with _setup_lock:
+        if _listener is not None:
+            return
+        handlers = []
+        file_error = None
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                os.path.join(LOG_DIR, LOG_FILE), maxBytes=LOG_MAX_BYTES,
+                backupCount=LOG_BACKUPS, encoding="utf-8", delay=True)
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+        except OSError as e:
+            file_error = e  # read-only install: console only
+        console = logging.StreamHandler()
+        console.setLevel(CONSOLE_LEVEL)
+        console.setFormatter(ConsoleFormatter())
+        handlers.append(console)
+
+        records = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(records))
+        listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        listener.start()
+        _listener = listener
+        atexit.register(shutdown)
+    if file_error is not None:
+        warning("event_log_file_disabled", path=LOG_DIR, error=str(file_error))
+
+
+def shutdown():
+    """Write out everything queued so far and stop the writer thread."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+
+def set_user(username):
+    """Attach username to every following event (None after logout)."""
+    _context["user"] = username
+
+
+def event(name, level=logging.INFO, **fields):
+    setup()
+    if logger.isEnabledFor(level):
+        logger.log(level, name, extra={"fields": fields, "user": _context["user"]})
+
+
+def warning(name, **fields):
+    event(name, logging.WARNING, **fields)
+
+
+def error_text(exc):
+    """str(exc) with the appid query parameter masked, safe to write to the log."""
+    return _SECRET_PARAM.sub(r"\1***", str(exc))
+
+
+def error(name, exc=None, **fields):
+    if exc is not None:
+        fields["error"] = error_text(exc)
+        fields["error_type"] = type(exc).__name__
+    event(name, logging.ERROR, **fields)
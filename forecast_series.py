@@ -0,0 +1,129 @@
+# forecast_series.py
+"""
+The /forecast payload as NumPy arrays, parsed once and shared.
+
+    series = ForecastSeries.from_payload(forecast)
+    for day in series.daily(5):
+        print(day.date, day.temp_min, day.temp_max, day.condition, day.precipitation)
+
+OpenWeatherMap returns 3-hourly entries (40 for five days) stamped in UTC.
+Days are cut at local midnight using the city's UTC offset from
+forecast["city"]["timezone"], not at UTC midnight as dt_txt would give.
+Per-day statistics are grouped reductions over the arrays, so charts and
+comparisons can use series.temp, series.pop, ... directly without walking
+the JSON again.
+"""
+import datetime
+from typing import List, NamedTuple
+
+import numpy as np
+
+# ---------- CONFIG ----------
+# breaks ties between equally frequent conditions: more significant weather wins
+CONDITION_WEIGHT = {"thunderstorm": 6, "snow": 5, "rain": 4, "drizzle": 3,
+                    "clouds": 1, "clear": 0}
+OTHER_WEIGHT = 2  # mist, fog, haze, ...
+# -----------------------------
+
+
+class DaySummary(NamedTuple):
+    date: datetime.date  # local calendar day
+    temp_min: float
+    temp_max: float
+    temp_mean: float
+    condition: str        # most frequent weather "main", lower case
+    precipitation: float  # rain + snow in mm
+    pop: float            # highest probability of precipitation, 0..1
+    samples: int          # forecast entries that fell on this day
+
+
+def _number(value):
+    return np.nan if value is None else float(value)
+
+
+class ForecastSeries:
+    """Parallel arrays, one element per forecast entry, ordered by time."""
+
+    def __init__(self, dt, temp, feels_like, humidity, pop, rain, snow, wind,
+                 condition, condition_id, utc_offset=0):
+        order = np.argsort(dt, kind="stable")
+        self.dt = dt[order]                  # int64 unix seconds (UTC)
+        self.temp = temp[order]              # float64, NaN where missing
+        self.feels_like = feels_like[order]
+        self.humidity = humidity[order]
+        self.pop = pop[order]
+        self.rain = rain[order]              # mm over the 3 h step
+        self.snow = snow[order]
+        self.wind = wind[order]
+        self.condition = condition[order]    # str array of lower-case weather "main"
+        self.condition_id = condition_id[order]
+        self.utc_offset = int(utc_offset)
+        # local wall-clock time and calendar day of every entry
+        self.local = (self.dt + self.utc_offset).astype("datetime64[s]")
+        self.day = self.local.astype("datetime64[D]")
+
+    @classmethod
+    def from_payload(cls, forecast):
+        """Build from a /forecast JSON dict; entries without a timestamp are skipped."""
+        items = [item for item in (forecast or {}).get("list", []) if item.get("dt") is not None]
+        mains = [item.get("main", {}) for item in items]
+        weathers = [(item.get("weather") or [{}])[0] for item in items]
+        return cls(
+            dt=np.array([item["dt"] for item in items], dtype=np.int64),
+            temp=np.array([_number(m.get("temp")) for m in mains], dtype=np.float64),
+            feels_like=np.array([_number(m.get("feels_like")) for m in mains], dtype=np.float64),
+            humidity=np.array([_number(m.get("humidity")) for m in mains], dtype=np.float64),
+            pop=np.array([item.get("pop", 0.0) for item in items], dtype=np.float64),
+            rain=np.array([(item.get("rain") or {}).get("3h", 0.0) for item in items],
+                          dtype=np.float64),
+            snow=np.array([(item.get("snow") or {}).get("3h", 0.0) for item in items],
+                          dtype=np.float64),
+            wind=np.array([_number(item.get("wind", {}).get("speed")) for item in items],
+                          dtype=np.float64),
+            condition=np.array([(w.get("main") or "").lower() for w in weathers], dtype=str),
+            condition_id=np.array([w.get("id") or 0 for w in weathers], dtype=np.int64),
+            utc_offset=((forecast or {}).get("city") or {}).get("timezone") or 0,
+        )
+
+    def __len__(self):
+        return len(self.dt)
+
+    def hour_labels(self, count=None):
+        """Local "HH:MM" of the first count entries."""
+        stamps = np.datetime_as_string(self.local[:count], unit="m")
+        return [s[11:] for s in stamps]
+
+    def daily(self, days=None) -> List[DaySummary]:
+        """One summary per local calendar day, earliest first (at most days of them)."""
+        if not len(self):
+            return []
+        dates, starts, index, counts = np.unique(self.day, return_index=True,
+                                                 return_inverse=True, return_counts=True)
+        index = index.reshape(-1)  # numpy 2.x keeps the input's shape here
+
+        # temperature: fmin/fmax skip NaN, mean over the values present
+        temp_min = np.fmin.reduceat(self.temp, starts)
+        temp_max = np.fmax.reduceat(self.temp, starts)
+        present = ~np.isnan(self.temp)
+        temp_sum = np.bincount(index, weights=np.where(present, self.temp, 0.0))
+        temp_n = np.bincount(index, weights=present)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            temp_mean = temp_sum / temp_n
+
+        precipitation = np.bincount(index, weights=self.rain + self.snow)
+        pop = np.fmax.reduceat(self.pop, starts)
+
+        # dominant condition: most entries per day, ties to the more significant one
+        names, cond_index = np.unique(self.condition, return_inverse=True)
+        tally = np.zeros((len(dates), len(names)))
+        np.add.at(tally, (index, cond_index.reshape(-1)), 1.0)
+        tally += np.array([CONDITION_WEIGHT.get(n, OTHER_WEIGHT) for n in names]) * 1e-3
+        dominant = names[tally.argmax(axis=1)]
+
+        summaries = [
+            DaySummary(dates[i].astype(object), float(temp_min[i]), float(temp_max[i]),
+                       float(temp_mean[i]), str(dominant[i]), round(float(precipitation[i]), 2),
+                       float(pop[i]), int(counts[i]))
+            for i in range(len(dates))
+        ]
+        return summaries[:days]
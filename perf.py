@@ -0,0 +1,219 @@
+# perf.py
+"""
+Lightweight timing instrumentation for the hot paths.
+
+    with perf.span("http.weather"):
+        ...
+
+    @perf.timed("ui.update_weather")
+    def update_ui_with_data(...):
+
+Every span name gets a Histogram holding totals since startup plus a rolling
+window of the last HISTOGRAM_WINDOW durations (for percentiles). The
+registry can be dumped as JSON, rendered in Prometheus text format, or
+served over HTTP on /metrics (serve_metrics, or WEATHERLY_METRICS_PORT).
+Set WEATHERLY_PERF=0 to turn recording off.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ---------- CONFIG ----------
+ENABLED = os.environ.get("WEATHERLY_PERF", "1") != "0"
+METRICS_PORT = int(os.environ.get("WEATHERLY_METRICS_PORT", "0"))  # 0 = no endpoint
+HISTOGRAM_WINDOW = 1024   # recent samples kept per span name
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# -----------------------------
+
+
+class Histogram:
+    """Durations of one span name: lifetime totals and buckets, plus a rolling window."""
+
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0  # seconds
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)  # last one is +Inf
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.buckets[index] += 1
+            if error:
+                self.errors += 1
+            self.recent.append(ms)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self.recent)
+            count, errors, total = self.count, self.errors, self.total
+            buckets = list(self.buckets)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))], 3) if recent else None
+
+        return {
+            "count": count,
+            "errors": errors,
+            "total_s": round(total, 6),
+            "mean_ms": round(total * 1000 / count, 3) if count else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(recent[-1], 3) if recent else None,
+            "buckets": buckets,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name) -> Histogram:
+        hist = self._histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(name, Histogram())
+        return hist
+
+    def observe(self, name, seconds, error=False):
+        if ENABLED:
+            self.histogram(name).observe(seconds, error)
+
+    def snapshot(self):
+        """{span name: stats}, sorted by name."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        return {name: hist.snapshot() for name, hist in items}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+# ===========================
+# Recording
+# ===========================
+@contextmanager
+def span(name):
+    """Time the with-block under name; an exception is counted as an error and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.observe(name, time.perf_counter() - start, error=True)
+        raise
+    registry.observe(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument(namespace, prefix, names):
+    """Replace the functions names in namespace (a module's globals()) with timed wrappers."""
+    for name in names:
+        namespace[name] = timed(f"{prefix}.{name}")(namespace[name])
+
+
+# ===========================
+# Export
+# ===========================
+def to_json():
+    return json.dumps({"generated": time.time(), "spans": registry.snapshot()}, indent=2)
+
+
+def export_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_json())
+    return path
+
+
+def to_prometheus():
+    """Prometheus text exposition: one weatherly_span_seconds histogram labelled by span."""
+    lines = [
+        "# HELP weatherly_span_seconds Duration of instrumented Weatherly operations.",
+        "# TYPE weatherly_span_seconds histogram",
+    ]
+    errors = ["# HELP weatherly_span_errors_total Instrumented operations that raised.",
+              "# TYPE weatherly_span_errors_total counter"]
+    for name, stats in registry.snapshot().items():
+        label = 'span="%s"' % name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, n in zip(BUCKETS_MS, stats["buckets"]):
+            cumulative += n
+            lines.append(f'weatherly_span_seconds_bucket{{{label},le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'weatherly_span_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+        lines.append(f"weatherly_span_seconds_sum{{{label}}} {stats['total_s']}")
+        lines.append(f"weatherly_span_seconds_count{{{label}}} {stats['count']}")
+        errors.append(f"weatherly_span_errors_total{{{label}}} {stats['errors']}")
+    return "\n".join(lines + errors) + "\n"
+
+
+_server = None
+
+
+def serve_metrics(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve to_prometheus() on http://host:port/metrics from a daemon thread; returns the URL."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics":
+                body, ctype = to_prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path.split("?")[0] == "/metrics.json":
+                body, ctype = to_json().encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="weatherly-metrics",
+                         daemon=True).start()
+    return metrics_url()
+
+
+def metrics_url():
+    if _server is None:
+        return None
+    host, port = _server.server_address[:2]
+    return f"http://{host}:{port}/metrics"
+
+
+def stop_metrics():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
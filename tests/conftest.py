@@ -0,0 +1,18 @@
+# conftest.py
+"""Shared test setup: import the app modules from the repo root, log to a temp dir."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eventlog  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def temp_log_dir(tmp_path_factory):
+    # keep events out of the working copy's logs/
+    eventlog.LOG_DIR = str(tmp_path_factory.mktemp("weatherly-logs"))
+    yield eventlog.LOG_DIR
+    eventlog.shutdown()
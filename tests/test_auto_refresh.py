@@ -0,0 +1,40 @@
+# test_auto_refresh.py
+"""AutoRefresher rounds: per-city failures and one round at a time."""
+import unittest
+from unittest import mock
+
+import weather_api
+from weather_api import AutoRefresher
+
+PAYLOADS = {
+    "Oslo": {"id": 3143244, "main": {"temp": 2.4}, "weather": [{"main": "Snow"}]},
+    "Paris": {"id": 2988507, "main": {"temp": 11.6}, "weather": [{"main": "Clouds"}]},
+    "Bad": {"id": 1, "main": {"temp": None}, "weather": []},  # malformed
+}
+
+
+class AutoRefreshRoundTest(unittest.TestCase):
+    def setUp(self):
+        self.refresher = AutoRefresher(mock.Mock(), lambda: None, lambda: "metric",
+                                       on_current=None, interval_s=60)
+        self.db = mock.patch.object(weather_api, "database").start()
+        mock.patch.object(weather_api, "fetch_current",
+                          lambda city, *args: PAYLOADS[city]).start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(self.refresher.worker.shutdown)
+
+    def test_bad_payload_fails_only_that_city(self):
+        favorites = [("Oslo", None), ("Bad", None), ("Paris", None)]
+        self.refresher._refresh_round(None, favorites, "metric")
+        self.db.update_favorites_weather.assert_called_once_with(
+            [("Oslo", 2, "Snow"), ("Paris", 12, "Clouds")])
+        self.db.set_favorite_city_ids.assert_called_once_with(
+            [("Oslo", 3143244), ("Paris", 2988507)])
+        self.assertEqual(list(self.refresher._backoff), ["bad"])
+
+    def test_overlapping_round_is_skipped(self):
+        with self.refresher._round_lock:
+            self.assertIsNone(self.refresher._refresh_round(None, [("Oslo", None)], "metric"))
+        self.db.update_favorites_weather.assert_not_called()
+        self.refresher._refresh_round(None, [("Oslo", None)], "metric")
+        self.db.update_favorites_weather.assert_called_once()
@@ -0,0 +1,124 @@
+# test_circuit_breaker.py
+"""State transitions of weather_api.CircuitBreaker and how _request drives them."""
+import unittest
+from unittest import mock
+
+import requests
+
+import weather_api
+from weather_api import CircuitBreaker, CircuitOpen
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold_failures(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=60)
+        for _ in range(2):
+            self.assertTrue(breaker.allow())
+            breaker.failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_after(), 0)
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_one_trial(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())  # trial still in flight
+
+    def test_half_open_trial_success_closes(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        breaker.failure()
+        breaker.allow()
+        breaker.success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_half_open_trial_failure_reopens(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        breaker.failure()
+        breaker._opened_at -= 60  # cooldown over
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_release_frees_trial_without_verdict(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        breaker.failure()
+        breaker.allow()
+        breaker.release()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+
+class RequestBreakerTest(unittest.TestCase):
+    """_request must give the breaker a verdict (or release it) on every path."""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=1, cooldown=0)
+        self.session = mock.Mock()
+        for target, value in [
+            ("breakers", {"weather": self.breaker}),
+            ("get_session", lambda: self.session),
+            ("_backoff_delay", lambda attempt: 0),
+            ("offline", weather_api.OfflineState()),
+        ]:
+            patcher = mock.patch.object(weather_api, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker.failure()  # open; cooldown 0 so the next call is the half-open trial
+
+    def request(self):
+        return weather_api._request("http://example.invalid/weather", {}, endpoint="weather")
+
+    def test_truncated_body_is_retried_and_recorded(self):
+        self.session.get.side_effect = requests.exceptions.ChunkedEncodingError("cut short")
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.request()
+        self.assertEqual(self.session.get.call_count, weather_api.RETRY_ATTEMPTS)
+        self.assertFalse(self.breaker._trial)
+        self.assertFalse(weather_api.offline.active)  # the host did answer
+
+    def test_other_request_error_records_failure(self):
+        self.session.get.side_effect = requests.exceptions.TooManyRedirects("loop")
+        with self.assertRaises(requests.exceptions.TooManyRedirects):
+            self.request()
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker._trial)
+
+    def test_unexpected_error_releases_trial(self):
+        self.session.get.side_effect = ValueError("bug")
+        with self.assertRaises(ValueError):
+            self.request()
+        self.assertFalse(self.breaker._trial)
+        self.assertTrue(self.breaker.allow())
+
+    def test_breaker_recovers_after_failed_trial(self):
+        self.session.get.side_effect = requests.exceptions.ChunkedEncodingError("cut short")
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.request()
+        response = mock.Mock(status_code=200, content=b"{}", headers={})
+        self.session.get.side_effect = None
+        self.session.get.return_value = response
+        with mock.patch.object(weather_api.database, "queue_api_call"):
+            self.assertIs(self.request(), response)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_open_breaker_fails_fast(self):
+        self.breaker.cooldown = 60
+        self.breaker.failure()
+        with self.assertRaises(CircuitOpen):
+            self.request()
+        self.session.get.assert_not_called()
+
@@ -0,0 +1,174 @@
+# test_cities.py
+"""The cities.bin format and CityIndex lookups over it."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cities import CityIndex, CityTable, build_table
+
+CITIES = [
+    {"id": 2643743, "name": "London", "state": "", "country": "GB",
+     "coord": {"lon": -0.12574, "lat": 51.50853}},
+    {"id": 6058560, "name": "London", "state": "", "country": "CA",
+     "coord": {"lon": -81.23304, "lat": 42.98339}},
+    {"id": 4517009, "name": "London", "state": "OH", "country": "US",
+     "coord": {"lon": -83.44825, "lat": 39.88645}},
+    {"id": 2643741, "name": "City of London", "state": "", "country": "GB",
+     "coord": {"lon": -0.09184, "lat": 51.51279}},
+    {"id": 2644210, "name": "Liverpool", "state": "", "country": "GB",
+     "coord": {"lon": -2.97794, "lat": 53.41058}},
+    {"id": 3143244, "name": "Oslo", "state": "", "country": "NO",
+     "coord": {"lon": 10.74609, "lat": 59.91273}},
+    {"id": 5746545, "name": "Portland", "state": "OR", "country": "US",
+     "coord": {"lon": -122.67621, "lat": 45.52345}},
+    {"id": 4975802, "name": "Portland", "state": "ME", "country": "US",
+     "coord": {"lon": -70.25533, "lat": 43.66147}},
+]
+
+
+def index_of(records):
+    index = CityIndex()
+    index._set_table(CityTable(build_table(records)), "<memory>", 0)
+    return index
+
+
+class CityTableTest(unittest.TestCase):
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            CityTable(b"\0" * 64)
+
+    def test_rejects_truncated_table(self):
+        data = build_table(CITIES)
+        for size in (0, 10, len(data) // 2, len(data) - 1):
+            with self.assertRaises(ValueError):
+                CityTable(data[:size])
+
+    def test_records_round_trip(self):
+        table = CityTable(build_table(CITIES))
+        self.assertEqual(table.count, len(CITIES))
+        keys = [table.key(n) for n in range(table.count)]
+        self.assertEqual(keys, sorted(keys))
+        oslo = table.city(table.find_id(3143244))
+        self.assertEqual((oslo.name, oslo.state, oslo.country), ("Oslo", "", "NO"))
+        self.assertAlmostEqual(oslo.lat, 59.9127, places=4)
+        self.assertIsNone(table.find_id(1))
+
+
+class CityIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = index_of(CITIES)
+
+    def test_suggest_prefix(self):
+        self.assertEqual([c.name for c in self.index.suggest("lo")], ["London"] * 3)
+        self.assertEqual([c.name for c in self.index.suggest("Li")], ["Liverpool"])
+        self.assertEqual(self.index.suggest("x"), [])
+        self.assertEqual(len(self.index.suggest("l", limit=2)), 2)
+
+    def test_suggest_filters_by_country_and_state(self):
+        self.assertEqual([c.id for c in self.index.suggest("london, ca")], [6058560])
+        self.assertEqual([c.id for c in self.index.suggest("Lon, GB")], [2643743])
+        self.assertEqual([c.label for c in self.index.suggest("portland, or")],
+                         ["Portland, OR, US"])
+
+    def test_resolve(self):
+        self.assertEqual(self.index.resolve("OSLO").id, 3143244)
+        self.assertEqual(self.index.resolve("London, GB").id, 2643743)
+        self.assertEqual(self.index.resolve("Portland, ME, US").id, 4975802)
+        self.assertIsNone(self.index.resolve("London"))  # three of them
+        self.assertIsNone(self.index.resolve("Atlantis"))
+
+    def test_get_by_id(self):
+        self.assertEqual(self.index.get(4517009).label, "London, OH, US")
+        self.assertIsNone(self.index.get(42))
+
+    def test_fuzzy(self):
+        self.assertEqual(self.index.fuzzy("Lodnon")[0].name, "London")
+
+    def test_empty_index(self):
+        index = CityIndex()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.suggest("lon"), [])
+        self.assertIsNone(index.get(2643743))
+
+
+class CityIndexLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="weatherly-test-cities-")
+        self.source = os.path.join(self.dir, "city.list.json")
+        self.table = os.path.join(self.dir, "cities.bin")
+        self.index = CityIndex()
+
+    def tearDown(self):
+        if self.index._table is not None:
+            self.index._table.close()
+        shutil.rmtree(self.dir)
+
+    def write_source(self, records, mtime):
+        with open(self.source, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.utime(self.source, (mtime, mtime))
+
+    def test_builds_then_maps_table(self):
+        self.write_source(CITIES, 1_000_000)
+        self.assertTrue(self.index.load(self.table, [self.source]))
+        self.assertTrue(os.path.exists(self.table))
+        self.assertEqual(len(self.index), len(CITIES))
+
+        built_at = os.path.getmtime(self.table)
+        self.assertTrue(self.index.load(self.table, [self.source]))  # up to date: reused
+        self.assertEqual(os.path.getmtime(self.table), built_at)
+
+    def test_rebuilds_when_source_is_newer(self):
+        self.write_source(CITIES, 1_000_000)
+        self.index.load(self.table, [self.source])
+        os.utime(self.table, (2_000_000, 2_000_000))
+
+        bergen = {"id": 3161732, "name": "Bergen", "state": "", "country": "NO",
+                  "coord": {"lon": 5.32415, "lat": 60.39299}}
+        self.write_source(CITIES + [bergen], 3_000_000)
+        self.assertTrue(self.index.load(self.table, [self.source]))
+        self.assertEqual(len(self.index), len(CITIES) + 1)
+        self.assertEqual(self.index.get(3161732).name, "Bergen")
+        self.assertGreater(os.path.getmtime(self.table), 2_000_000)
+
+    def truncate_table(self):
+        with open(self.table, "r+b") as f:
+            f.truncate(os.path.getsize(self.table) // 2)
+
+    def test_rebuilds_truncated_table(self):
+        self.write_source(CITIES, 1_000_000)
+        self.index.load(self.table, [self.source])
+        self.index._table.close()
+        self.index = CityIndex()
+        self.truncate_table()  # still newer than the source
+        self.assertTrue(self.index.load(self.table, [self.source]))
+        self.assertEqual(len(self.index), len(CITIES))
+        self.assertEqual(self.index.get(3143244).name, "Oslo")
+
+    def test_truncated_table_without_source(self):
+        self.write_source(CITIES, 1_000_000)
+        self.index.load(self.table, [self.source])
+        self.index._table.close()
+        self.index = CityIndex()
+        self.truncate_table()
+        os.remove(self.source)
+        self.assertFalse(self.index.load(self.table, [self.source]))
+        self.assertEqual(self.index.suggest("lon"), [])
+
+    def test_reload_keeps_old_table_readable(self):
+        self.write_source(CITIES, 1_000_000)
+        self.index.load(self.table, [self.source])
+        in_use = self.index._table  # as held by a query running on another thread
+        os.utime(self.table, (2_000_000, 2_000_000))
+        self.write_source(CITIES[:2], 3_000_000)
+        self.index.load(self.table, [self.source])
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(in_use.city(in_use.find_id(3143244)).name, "Oslo")
+        in_use.close()
+
+    def test_missing_files(self):
+        self.assertFalse(self.index.load(self.table, [self.source]))
+        self.assertFalse(self.index.loaded)
+
@@ -0,0 +1,66 @@
+# test_eventlog.py
+"""The API key never reaches the event log, on file or on stderr."""
+import contextlib
+import io
+import os
+import unittest
+from unittest import mock
+
+import requests
+
+import eventlog
+import weather_api
+
+SECRET = "0123456789abcdef0123456789abcdef"
+URL = f"https://api.openweathermap.org/data/2.5/weather?appid={SECRET}&q=Oslo&units=metric"
+
+
+def http_error():
+    response = requests.Response()
+    response.status_code = 401
+    response.reason = "Unauthorized"
+    response.url = URL
+    try:
+        response.raise_for_status()
+    except requests.HTTPError as e:
+        return e
+
+
+class SecretMaskingTest(unittest.TestCase):
+    def setUp(self):
+        eventlog.shutdown()  # restarted below with stderr captured, on an empty file
+        self.path = os.path.join(eventlog.LOG_DIR, eventlog.LOG_FILE)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.stderr = io.StringIO()
+        with contextlib.redirect_stderr(self.stderr):
+            eventlog.setup()
+        self.addCleanup(eventlog.shutdown)
+
+    def written(self):
+        eventlog.shutdown()
+        with open(self.path, encoding="utf-8") as f:
+            return f.read(), self.stderr.getvalue()
+
+    def test_error_text_masks_appid(self):
+        error = http_error()
+        self.assertIn(SECRET, str(error))
+        self.assertNotIn(SECRET, eventlog.error_text(error))
+        self.assertIn("appid=***&q=Oslo", eventlog.error_text(error))
+
+    def test_error_event(self):
+        eventlog.error("http_failed", http_error(), endpoint="weather")
+        log, stderr = self.written()
+        self.assertIn('"error_type": "HTTPError"', log)
+        self.assertIn("http_failed", stderr)
+        self.assertNotIn(SECRET, log + stderr)
+
+    def test_auto_refresh_city_failure(self):
+        refresher = weather_api.AutoRefresher(mock.Mock(), lambda: None, lambda: "metric",
+                                              on_current=None, interval_s=60)
+        self.addCleanup(refresher.worker.shutdown)
+        refresher._failed("Oslo", http_error())
+        log, stderr = self.written()
+        self.assertIn("auto_refresh_city_failed", log)
+        self.assertIn("auto_refresh_city_failed", stderr)
+        self.assertNotIn(SECRET, log + stderr)
@@ -0,0 +1,83 @@
+# test_forecast_series.py
+"""ForecastSeries parsing and local-day aggregation."""
+import calendar
+import datetime
+import math
+import unittest
+
+from forecast_series import ForecastSeries
+
+
+def utc(text):
+    return calendar.timegm(datetime.datetime.strptime(text, "%Y-%m-%d %H:%M").timetuple())
+
+
+def entry(when, temp, main="Clouds", pop=0.0, rain=None):
+    item = {"dt": utc(when), "main": {"temp": temp}, "weather": [{"main": main, "id": 800}],
+            "pop": pop}
+    if rain is not None:
+        item["rain"] = {"3h": rain}
+    return item
+
+
+def payload(items, timezone=0):
+    return {"list": items, "city": {"name": "X", "timezone": timezone}}
+
+
+class ForecastSeriesTest(unittest.TestCase):
+    def test_sorted_by_time_and_labels_line_up(self):
+        series = ForecastSeries.from_payload(payload([
+            entry("2024-03-01 18:00", 3.0, "Rain"),
+            entry("2024-03-01 12:00", 1.0, "Clear"),
+            {"main": {"temp": 99.0}},  # no dt: skipped
+            entry("2024-03-01 15:00", 2.0, "Snow"),
+        ], timezone=3600))
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series.hour_labels(), ["13:00", "16:00", "19:00"])
+        self.assertEqual(list(series.temp), [1.0, 2.0, 3.0])
+        self.assertEqual(list(series.condition), ["clear", "snow", "rain"])
+
+    def test_daily_cuts_at_local_midnight_east_of_utc(self):
+        # UTC+9: 15:00 UTC is already midnight of the next local day
+        series = ForecastSeries.from_payload(payload([
+            entry("2024-03-01 09:00", 5.0, "Clear"),
+            entry("2024-03-01 12:00", 7.0, "Clear"),
+            entry("2024-03-01 15:00", 2.0, "Rain", pop=0.8, rain=1.5),
+            entry("2024-03-01 18:00", 1.0, "Rain", pop=0.4, rain=0.5),
+            entry("2024-03-01 21:00", 0.0, "Clouds"),
+        ], timezone=9 * 3600))
+        days = series.daily()
+        self.assertEqual([d.date for d in days],
+                         [datetime.date(2024, 3, 1), datetime.date(2024, 3, 2)])
+        first, second = days
+        self.assertEqual((first.temp_min, first.temp_max, first.samples), (5.0, 7.0, 2))
+        self.assertEqual(first.condition, "clear")
+        self.assertEqual((second.temp_min, second.temp_max, second.samples), (0.0, 2.0, 3))
+        self.assertEqual(second.temp_mean, 1.0)
+        self.assertEqual(second.condition, "rain")
+        self.assertEqual(second.precipitation, 2.0)
+        self.assertEqual(second.pop, 0.8)
+
+    def test_daily_cuts_at_local_midnight_west_of_utc(self):
+        # UTC-5: 03:00 UTC still belongs to the previous local day
+        series = ForecastSeries.from_payload(payload([
+            entry("2024-03-02 00:00", 4.0),
+            entry("2024-03-02 03:00", 3.0),
+            entry("2024-03-02 06:00", 2.0),
+        ], timezone=-5 * 3600))
+        self.assertEqual([(d.date.day, d.samples) for d in series.daily()], [(1, 2), (2, 1)])
+
+    def test_missing_temperatures(self):
+        series = ForecastSeries.from_payload(payload([
+            entry("2024-03-01 00:00", None),
+            entry("2024-03-01 03:00", 4.0),
+            entry("2024-03-02 00:00", None),
+        ]))
+        first, second = series.daily()
+        self.assertEqual((first.temp_min, first.temp_max, first.temp_mean), (4.0, 4.0, 4.0))
+        self.assertTrue(math.isnan(second.temp_max))
+
+    def test_limit_and_empty(self):
+        items = [entry(f"2024-03-0{d} 12:00", float(d)) for d in range(1, 7)]
+        self.assertEqual(len(ForecastSeries.from_payload(payload(items)).daily(5)), 5)
+        self.assertEqual(ForecastSeries.from_payload({}).daily(), [])
@@ -0,0 +1,110 @@
+# test_migrations.py
+"""database.migrate() on a version-1 database with text timestamps."""
+import calendar
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime
+
+import database
+
+
+def unix(text):
+    # version 1 wrote logs with datetime.utcnow().strftime(...)
+    return calendar.timegm(datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timetuple())
+
+
+LOGS = [  # id, username, timestamp, city, temp
+    (1, "alice", "2024-03-01 08:15:00", "Oslo", 2),
+    (2, "bob", "2024-03-01 09:00:00", "Paris", 11),
+    (3, "alice", "2024-03-02 18:30:45", "London", 9),
+    (4, "alice", "2024-03-02 18:30:45", "Leeds", 8),  # same second as id 3
+    (5, "alice", None, "Rome", 15),
+    (6, "alice", "2024-02-28 23:59:59", "Bergen", 4),
+]
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="weatherly-test-db-")
+        self.path = os.path.join(self.dir, "weather.db")
+        self._old_db_file = database.DB_FILE
+        database.DB_FILE = self.path
+        # build the version-1 schema by hand instead of letting get_connection migrate it
+        database._schema_ready.add(self.path)
+        with database.transaction() as c:
+            database._migration_1(c)
+            c.execute("PRAGMA user_version = 1")
+            c.executemany("INSERT INTO logs (id, username, timestamp, city, temp) VALUES (?, ?, ?, ?, ?)",
+                          LOGS)
+            c.executemany("INSERT INTO favorites (city, last_temp, condition, date_added) VALUES (?, ?, ?, ?)",
+                          [("Oslo", 2, "Snow", "2024-01-05T12:00:00.123456"),
+                           ("Paris", 11, "Clouds", None)])
+            c.executemany("INSERT INTO recents (city, last_temp, time_searched) VALUES (?, ?, ?)",
+                          [("Oslo", 2, "2024-03-01T08:15:00.250000"),
+                           ("Paris", 11, None)])
+        database._schema_ready.discard(self.path)
+
+    def tearDown(self):
+        database.close_connection()
+        database._schema_ready.discard(self.path)
+        database.DB_FILE = self._old_db_file
+        shutil.rmtree(self.dir)
+
+    def test_upgrades_to_current_version(self):
+        self.assertEqual(database.get_schema_version(), 1)
+        database.migrate()
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+        database.migrate()  # already current: no-op
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+
+    def test_log_timestamps_become_unix_time(self):
+        database.migrate()
+        rows = database.get_connection().execute(
+            "SELECT id, timestamp, typeof(timestamp) FROM logs ORDER BY id").fetchall()
+        expected = [(row[0], unix(row[2]) if row[2] else 0, "integer") for row in LOGS]
+        self.assertEqual(rows, expected)
+
+    def test_favorite_dates_become_unix_time(self):
+        database.migrate()
+        rows = database.get_connection().execute(
+            "SELECT city, date_added, typeof(date_added) FROM favorites ORDER BY city").fetchall()
+        self.assertEqual(rows, [("Oslo", unix("2024-01-05 12:00:00"), "integer"),
+                                ("Paris", 0, "integer")])
+
+    def test_recent_times_become_unix_time(self):
+        database.migrate()
+        rows = database.get_connection().execute(
+            "SELECT city, time_searched, typeof(time_searched), city_id FROM recents ORDER BY id").fetchall()
+        self.assertEqual(rows, [("Oslo", unix("2024-03-01 08:15:00"), "integer", None),
+                                ("Paris", 0, "integer", None)])
+
+        database.add_recent("Rome", 15, 3169070)
+        self.assertEqual(database.get_recents(1)[0][1:], ("Rome", 15, mock.ANY, 3169070))
+        self.assertIsInstance(database.get_recents(1)[0][3], int)
+
+    def test_indexes_created(self):
+        database.migrate()
+        names = {row[0] for row in database.get_connection().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertLessEqual({"idx_logs_username_timestamp", "idx_logs_timestamp",
+                              "idx_favorites_date_added"}, names)
+
+    def test_keyset_pages_keep_order(self):
+        database.migrate()
+        pages = []
+        cursor = (None, None)
+        while True:
+            page = database.get_logs_page("alice", *cursor, limit=2)
+            if not page:
+                break
+            pages.append([row[0] for row in page])
+            cursor = (page[-1][1], page[-1][0])
+        self.assertEqual(pages, [[4, 3], [1, 6], [5]])
+
+        everyone = database.get_logs_page("", limit=10)
+        self.assertEqual([row[0] for row in everyone], [4, 3, 2, 1, 6, 5])
+        self.assertEqual(everyone[0][1:], (unix("2024-03-02 18:30:45"), "Leeds", 8))
+
@@ -0,0 +1,32 @@
+# test_response_cache.py
+"""weather_api.ResponseCache expiry, eviction and replacement."""
+import unittest
+
+from weather_api import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_get_fresh_and_expired(self):
+        cache = ResponseCache()
+        cache.put("k", {"v": 1}, 10, ttl=60, fetched_at=100)
+        self.assertEqual(cache.get("k"), ({"v": 1}, 100))
+        cache.put("k", {"v": 2}, 10, ttl=-1, fetched_at=200)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.get_stale("k"), ({"v": 2}, 200))
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", 1, 1, ttl=60)
+        cache.put("b", 2, 1, ttl=60)
+        cache.get("a")
+        cache.put("c", 3, 1, ttl=60)
+        self.assertIsNone(cache.get_stale("b"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_oversized_put_drops_older_entry(self):
+        cache = ResponseCache(max_bytes=100)
+        cache.put("k", {"v": 1}, 10, ttl=60)
+        cache.put("k", {"v": 2}, 101, ttl=60)
+        self.assertIsNone(cache.get("k"))
+        self.assertIsNone(cache.get_stale("k"))
+        self.assertEqual(cache.stats()["bytes"], 0)
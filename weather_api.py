@@ -0,0 +1,1042 @@
+# weather_api.py
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+
+import database
+import eventlog
+import perf
+
+# requests is imported on first use (get_session) to keep app startup fast
+
+# ---------- CONFIG ----------
+API_KEY = "YOUR API KEY HERE"
+# point WEATHERLY_API_BASE at a local stub server to run without the real API
+API_BASE = os.environ.get("WEATHERLY_API_BASE", "https://api.openweathermap.org/data/2.5").rstrip("/")
+WEATHER_URL = f"{API_BASE}/weather"
+FORECAST_URL = f"{API_BASE}/forecast"
+GROUP_URL = f"{API_BASE}/group"  # current weather for many city IDs
+
+POOL_SIZE = 4         # keep-alive connections kept open to the API host
+
+CURRENT_TTL = 10 * 60     # seconds a current-weather response stays fresh
+FORECAST_TTL = 60 * 60    # seconds a forecast response stays fresh
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 8 * 1024 * 1024
+DISK_CACHE_RETENTION = 7 * 24 * 3600  # expired rows older than this get pruned
+
+RATE_LIMIT_PER_MIN = 60  # provider limit for API_KEY, shared by every caller
+RATE_BURST = 10          # calls allowed back to back before throttling kicks in
+RATE_WAIT_INTERACTIVE = 10   # seconds a search waits for a token before giving up
+RATE_WAIT_BACKGROUND = 120   # same for auto-refresh
+
+GROUP_MAX_IDS = 20      # provider limit of city IDs per group request
+GROUP_CONCURRENCY = 3   # group requests in flight at once
+
+REFRESH_JITTER = 0.1          # +/- fraction of the auto-refresh interval
+REFRESH_CONCURRENCY = 3       # cities fetched at once during an auto-refresh
+REFRESH_MAX_BACKOFF = 6 * 3600  # longest a failing city is skipped for
+
+CONNECT_TIMEOUT = 3.05  # seconds to open a connection, any endpoint
+READ_TIMEOUTS = {       # seconds to wait for the response, per endpoint
+    "weather": 5,
+    "forecast": 10,     # ~40 entries, noticeably slower than /weather
+    "group": 10,
+}
+RETRY_ATTEMPTS = 3       # tries per call, the first one included
+RETRY_BASE_DELAY = 0.5   # backoff cap before the 2nd try; doubles every retry
+RETRY_MAX_DELAY = 4.0
+BREAKER_THRESHOLD = 5    # consecutive failures that open an endpoint's breaker
+BREAKER_COOLDOWN = 30    # seconds an open breaker fails fast before a trial call
+
+OFFLINE_RETRY_INTERVAL = 30  # seconds between replays of lookups served offline
+# -----------------------------
+
+_session = None
+_session_lock = threading.Lock()
+
+# current + forecast are requested side by side on this pool
+_io_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="weatherly-io")
+
+
+# ===========================
+# HTTP Session
+# ===========================
+def get_session():
+    """Shared keep-alive requests.Session, so the TCP/TLS handshake is paid once per process."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                # non-blocking: past POOL_SIZE busy connections a request opens a
+                # throwaway one instead of queueing behind background refreshes
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE,
+                                      pool_block=False)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# ===========================
+# Rate Limiting
+# ===========================
+INTERACTIVE = 0  # user searches
+BACKGROUND = 1   # auto-refresh and other housekeeping
+
+
+class RateLimited(Exception):
+    """The call was throttled, locally or by the provider (HTTP 429)."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every outbound API call.
+
+    Tokens refill at rate_per_min and up to burst of them can be banked.
+    Interactive callers go first: a background caller only takes a token
+    while no interactive caller is waiting. pause() drains the bucket until
+    a provider's Retry-After has passed.
+    """
+
+    def __init__(self, rate_per_min=RATE_LIMIT_PER_MIN, burst=RATE_BURST):
+        self.rate = rate_per_min / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting = [0, 0]  # callers waiting per priority lane
+
+    def acquire(self, priority=INTERACTIVE, timeout=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    paused = now < self.paused_until
+                    yielding = priority == BACKGROUND and self._waiting[INTERACTIVE] > 0
+                    if not paused and not yielding and self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+
+                    if paused:
+                        wait = self.paused_until - now
+                    elif self.tokens < 1:
+                        wait = (1 - self.tokens) / self.rate
+                    else:
+                        wait = 0.05  # yielding: woken when the interactive caller is done
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+    def retry_after(self) -> float:
+        with self._cond:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+limiter = RateLimiter()
+
+
+def _parse_retry_after(value, default=60.0):
+    # Retry-After is either delta-seconds or an HTTP date
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+# ===========================
+# Circuit Breaker
+# ===========================
+class CircuitOpen(Exception):
+    """The endpoint's circuit breaker is open, so the call was not attempted."""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"{endpoint} unavailable, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while an endpoint looks down.
+
+    Closed: calls go through and consecutive failures are counted; after
+    threshold of them the breaker opens. Open: calls are refused for cooldown
+    seconds. Half-open: one trial call goes through, closing the breaker on
+    success and reopening it on failure.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial = False  # half-open trial call in flight
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        # the call never reached the endpoint (e.g. rate limited): no verdict
+        with self._lock:
+            self._trial = False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+
+breakers = {endpoint: CircuitBreaker() for endpoint in READ_TIMEOUTS}
+
+
+# ===========================
+# Offline Mode
+# ===========================
+class OfflineState:
+    """
+    Whether the API host is reachable, and which lookups were answered from
+    the cache while it was not.
+
+    A request that still can't connect after its retries switches offline
+    mode on; any response from the host switches it off. While it is on,
+    fetch_weather answers from cached snapshots of any age without touching
+    the network, and every such lookup is remembered for OfflineSync to
+    refresh once the host is back.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.since = None  # unix time the host became unreachable
+        self._pending = OrderedDict()  # (city key, units) -> (city, city_id, units)
+        self._lock = threading.Lock()
+
+    def went_offline(self):
+        with self._lock:
+            if not self.active:
+                self.active = True
+                self.since = time.time()
+                eventlog.warning("offline_mode_on")
+
+    def came_online(self):
+        if not self.active:
+            return
+        with self._lock:
+            if self.active:
+                eventlog.event("offline_mode_off", offline_s=round(time.time() - self.since, 1))
+                self.active = False
+                self.since = None
+
+    def add_pending(self, city, city_id, units):
+        with self._lock:
+            self._pending[(city_cache_key(city, city_id), units)] = (city, city_id, units)
+
+    def discard_pending(self, city, city_id, units):
+        with self._lock:
+            self._pending.pop((city_cache_key(city, city_id), units), None)
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending.values())
+
+
+offline = OfflineState()
+
+
+def _ms_since(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def _backoff_delay(attempt):
+    # "full jitter": anywhere between 0 and the exponential cap
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _transient_errors():
+    # failures worth retrying: the host is unreachable, slow, or cut the response short
+    import requests
+
+    return (requests.ConnectionError, requests.Timeout,
+            requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+
+def _request(url, params, headers=None, priority=INTERACTIVE, endpoint="weather"):
+    """
+    Every outbound API call goes through here: circuit breaker, rate limit,
+    send, count.
+
+    Connection errors, timeouts, truncated or undecodable bodies and 5xx
+    responses are retried up to RETRY_ATTEMPTS times with jittered
+    exponential backoff; each of them counts as a failure for the endpoint's
+    breaker, as does any other requests error (raised without retrying).
+    Once the breaker is open CircuitOpen is raised right away instead of
+    waiting on the network. A 5xx left after the last try is returned for
+    the caller to raise.
+    """
+    import requests
+
+    transient = _transient_errors()
+    breaker = breakers[endpoint]
+    timeout = (CONNECT_TIMEOUT, READ_TIMEOUTS[endpoint])
+    wait = RATE_WAIT_INTERACTIVE if priority == INTERACTIVE else RATE_WAIT_BACKGROUND
+
+    for attempt in range(RETRY_ATTEMPTS):
+        if attempt:
+            time.sleep(_backoff_delay(attempt - 1))
+        if not breaker.allow():
+            raise CircuitOpen(endpoint, breaker.retry_after())
+        if not limiter.acquire(priority, timeout=wait):
+            breaker.release()
+            raise RateLimited(limiter.retry_after() or 1 / limiter.rate)
+
+        start = time.perf_counter()
+        try:
+            with perf.span(f"http.{endpoint}"):
+                r = get_session().get(url, params=params, headers=headers, timeout=timeout)
+        except transient as e:
+            breaker.failure()
+            if attempt + 1 == RETRY_ATTEMPTS:
+                eventlog.error("http_failed", e, endpoint=endpoint, retries=attempt,
+                               duration_ms=_ms_since(start))
+                if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    offline.went_offline()
+                raise
+            eventlog.warning("http_retry", endpoint=endpoint, attempt=attempt + 1,
+                             error=eventlog.error_text(e), duration_ms=_ms_since(start))
+            continue
+        except requests.RequestException as e:
+            # e.g. TooManyRedirects: not worth retrying, but still a verdict on the endpoint
+            breaker.failure()
+            eventlog.error("http_failed", e, endpoint=endpoint, retries=attempt,
+                           duration_ms=_ms_since(start))
+            raise
+        except BaseException:
+            # not a network outcome (a bug, KeyboardInterrupt): free the half-open trial slot
+            breaker.release()
+            raise
+
+        eventlog.event("http_request", endpoint=endpoint, status=r.status_code, retries=attempt,
+                       bytes=len(r.content), duration_ms=_ms_since(start))
+        offline.came_online()
+        throttled = r.status_code == 429
+        try:
+            database.queue_api_call(throttled)
+        except Exception as e:
+            eventlog.error("api_usage_log_failed", e)
+        if throttled:
+            breaker.release()
+            retry_after = _parse_retry_after(r.headers.get("Retry-After"))
+            limiter.pause(retry_after)
+            raise RateLimited(retry_after)
+
+        if r.status_code < 500:
+            breaker.success()
+            return r
+        breaker.failure()
+        if attempt + 1 == RETRY_ATTEMPTS:
+            return r
+        eventlog.warning("http_retry", endpoint=endpoint, attempt=attempt + 1, status=r.status_code)
+
+
+def _is_outage(e) -> bool:
+    """True for errors that mean the API is unreachable rather than the request bad."""
+    import requests
+
+    if isinstance(e, (CircuitOpen, RateLimited) + _transient_errors()):
+        return True
+    response = getattr(e, "response", None)
+    return isinstance(e, requests.HTTPError) and response is not None and response.status_code >= 500
+
+
+# ===========================
+# Response Cache
+# ===========================
+def normalize_city(city: str) -> str:
+    return " ".join(city.split()).casefold()
+
+
+class ResponseCache:
+    """
+    In-memory cache of decoded API responses.
+
+    Entries expire after a per-entry TTL and the least recently used ones are
+    evicted once either the entry count or the total response size is over
+    budget. Expired entries are kept until evicted so get_stale() can still
+    serve them while the API is down. Cached payloads are shared, so callers
+    must not mutate them.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, payload, fetched_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(payload, fetched_at) for a fresh entry, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[3]
+
+    def get_stale(self, key):
+        # like get(), but expired entries count too (and hits/misses don't)
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else (entry[2], entry[3])
+
+    def put(self, key, payload, size, ttl, fetched_at=None):
+        if fetched_at is None:
+            fetched_at = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # too big to cache, but the older payload must not outlive it
+            self._entries[key] = (time.monotonic() + ttl, size, payload, fetched_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[1]
+        self._bytes -= size
+
+
+response_cache = ResponseCache()
+
+
+# ===========================
+# Disk Cache (http_cache table in weather.db)
+# ===========================
+def _load_disk_entry(endpoint, city_key, units):
+    try:
+        return database.get_cached_response(endpoint, city_key, units)
+    except Exception as e:
+        eventlog.error("disk_cache_read_failed", e, endpoint=endpoint, city=city_key)
+        return None
+
+
+def _store_disk_entry(endpoint, city_key, units, r, fetched_at, ttl):
+    try:
+        database.save_cached_response(
+            endpoint, city_key, units, r.text,
+            r.headers.get("ETag"), r.headers.get("Last-Modified"),
+            fetched_at, fetched_at + ttl,
+        )
+    except Exception as e:
+        eventlog.error("disk_cache_write_failed", e, endpoint=endpoint, city=city_key)
+
+
+def prune_disk_cache():
+    try:
+        removed = database.prune_http_cache(time.time() - DISK_CACHE_RETENTION)
+    except Exception as e:
+        eventlog.error("disk_cache_prune_failed", e)
+        return 0
+    eventlog.event("disk_cache_pruned", removed=removed)
+    return removed
+
+
+def prune_disk_cache_in_background():
+    _io_pool.submit(prune_disk_cache)
+
+
+# ===========================
+# Fetching
+# ===========================
+def city_cache_key(city, city_id=None):
+    # a resolved OpenWeatherMap city ID is a stabler key than the typed name
+    return f"#{city_id}" if city_id is not None else normalize_city(city)
+
+
+class WeatherResult(NamedTuple):
+    """What fetch_weather returns. stale is set when the API was unreachable
+    and cached data was served instead; fetched_at is the (unix) time the
+    older of the two responses was fetched."""
+    current: dict
+    forecast: dict
+    stale: bool = False
+    fetched_at: float = 0.0
+
+
+def _decode(text):
+    with perf.span("json.decode"):
+        return json.loads(text)
+
+
+def _stale_payload(key, entry):
+    cached = response_cache.get_stale(key)
+    if cached is not None:
+        return cached
+    if entry:
+        return _decode(entry["payload"]), entry["fetched_at"]
+    return None
+
+
+def _get_json(endpoint, url, city, units, ttl, city_id=None, priority=INTERACTIVE,
+              allow_stale=False):
+    """
+    Look a response up in memory, then on disk, then on the network.
+    Returns (payload, fetched_at, stale).
+
+    Expired disk entries are revalidated with If-None-Match/If-Modified-Since
+    when the API sent validators; a 304 reuses the stored payload. With a
+    city_id the request uses id= instead of the q= name. With allow_stale,
+    offline mode or an outage (see _is_outage) falls back to a cached copy
+    of any age, and the lookup is queued for OfflineSync.
+    """
+    start = time.perf_counter()
+    city_key = city_cache_key(city, city_id)
+    key = (endpoint, city_key, units)
+
+    def done(cache, **fields):
+        # one "lookup" event per call: where the answer came from and how long it took
+        eventlog.event("lookup", endpoint=endpoint, city=city_key, units=units, cache=cache,
+                       duration_ms=_ms_since(start), **fields)
+
+    cached = response_cache.get(key)
+    if cached is not None:
+        done("memory")
+        return cached[0], cached[1], False
+
+    now = time.time()
+    entry = _load_disk_entry(endpoint, city_key, units)
+    if entry and entry["expires_at"] > now:
+        payload = _decode(entry["payload"])
+        response_cache.put(key, payload, len(entry["payload"]), entry["expires_at"] - now,
+                           entry["fetched_at"])
+        done("disk")
+        return payload, entry["fetched_at"], False
+
+    if allow_stale and offline.active:
+        cached = _stale_payload(key, entry)
+        if cached is not None:
+            offline.add_pending(city, city_id, units)
+            done("offline", age_s=round(now - cached[1]))
+            return cached[0], cached[1], True
+
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    params = {"appid": API_KEY, "units": units}
+    if city_id is not None:
+        params["id"] = city_id
+    else:
+        params["q"] = city
+    try:
+        r = _request(url, params, headers, priority, endpoint)
+        if r.status_code != 304:
+            r.raise_for_status()
+    except Exception as e:
+        cached = _stale_payload(key, entry) if allow_stale and _is_outage(e) else None
+        if cached is None:
+            done("miss", error=eventlog.error_text(e), error_type=type(e).__name__)
+            raise
+        offline.add_pending(city, city_id, units)
+        done("stale", age_s=round(now - cached[1]), error=eventlog.error_text(e), error_type=type(e).__name__)
+        return cached[0], cached[1], True
+
+    if r.status_code == 304 and entry:
+        try:
+            database.refresh_cached_response(endpoint, city_key, units, now, now + ttl)
+        except Exception as e:
+            eventlog.error("disk_cache_write_failed", e, endpoint=endpoint, city=city_key)
+        payload = _decode(entry["payload"])
+        response_cache.put(key, payload, len(entry["payload"]), ttl, now)
+        done("revalidated")
+        return payload, now, False
+
+    payload = _decode(r.text)
+    response_cache.put(key, payload, len(r.content), ttl, now)
+    _store_disk_entry(endpoint, city_key, units, r, now, ttl)
+    done("miss")
+    return payload, now, False
+
+
+def fetch_current(city: str, units: str, city_id=None, priority=INTERACTIVE):
+    """Fetch current conditions only (blocking). Never stale."""
+    return _get_json("weather", WEATHER_URL, city, units, CURRENT_TTL, city_id, priority)[0]
+
+
+def _fetch_group_chunk(ids, units, priority):
+    params = {"id": ",".join(str(i) for i in ids), "appid": API_KEY, "units": units}
+    r = _request(GROUP_URL, params, priority=priority, endpoint="group")
+    r.raise_for_status()
+    entries = _decode(r.text).get("list", [])
+
+    # seed the cache so opening one of these cities right after is instant
+    size = len(r.content) // max(len(entries), 1)
+    for entry in entries:
+        response_cache.put(("weather", city_cache_key(None, entry.get("id")), units),
+                           entry, size, CURRENT_TTL)
+    return entries
+
+
+@perf.timed("fetch.group")
+def fetch_group(city_ids, units, priority=BACKGROUND):
+    """
+    Current weather for many city IDs in as few requests as possible.
+
+    IDs are split into chunks of GROUP_MAX_IDS and the chunks are fetched
+    GROUP_CONCURRENCY at a time. Returns {city_id: current_data}; IDs from a
+    chunk that failed are simply missing from the result.
+    """
+    ids = list(dict.fromkeys(city_ids))
+    chunks = [ids[i:i + GROUP_MAX_IDS] for i in range(0, len(ids), GROUP_MAX_IDS)]
+    results = {}
+    if not chunks:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(GROUP_CONCURRENCY, len(chunks)),
+                            thread_name_prefix="weatherly-group") as pool:
+        futures = [pool.submit(_fetch_group_chunk, chunk, units, priority) for chunk in chunks]
+        for future in futures:
+            try:
+                entries = future.result()
+            except Exception as e:
+                eventlog.error("group_fetch_failed", e, units=units)
+                continue
+            for entry in entries:
+                results[entry.get("id")] = entry
+    return results
+
+
+@perf.timed("fetch.weather")
+def fetch_weather(city: str, units: str, city_id=None, priority=INTERACTIVE,
+                  allow_stale=True) -> WeatherResult:
+    """
+    Fetch current conditions and the 5-day forecast for a city (blocking).
+
+    Both endpoints are requested concurrently, so a search costs
+    max(current, forecast) rather than their sum. Fresh responses come from
+    response_cache or the on-disk http_cache (keyed by normalized city and
+    units) without touching the network. While the API is unreachable,
+    cached responses of any age are returned with stale=True.
+    """
+    forecast_future = _io_pool.submit(_get_json, "forecast", FORECAST_URL, city, units,
+                                      FORECAST_TTL, city_id, priority, allow_stale)
+    try:
+        current_data, current_at, current_stale = _get_json(
+            "weather", WEATHER_URL, city, units, CURRENT_TTL, city_id, priority, allow_stale)
+    except Exception:
+        forecast_future.cancel()
+        raise
+    forecast_data, forecast_at, forecast_stale = forecast_future.result()
+
+    return WeatherResult(current_data, forecast_data, current_stale or forecast_stale,
+                         min(current_at, forecast_at))
+
+
+# ===========================
+# Background Fetch Worker
+# ===========================
+class FetchWorker:
+    """
+    Runs blocking fetches off the Tk main thread.
+
+    Results come back through a thread-safe queue that is drained with
+    widget.after(), so callbacks always run on the main thread. Every submit()
+    supersedes the previous job: results of older jobs are dropped.
+    """
+
+    def __init__(self, widget, poll_ms=50, max_workers=2):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="weatherly-fetch")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._future = None
+        self._polling = False
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._future is not None and not self._future.done()
+
+    def submit(self, fn, *args, on_success=None, on_error=None) -> int:
+        with self._lock:
+            self._generation += 1
+            job_id = self._generation
+            if self._future is not None:
+                self._future.cancel()
+            self._future = self._executor.submit(self._run, job_id, fn, args,
+                                                 on_success, on_error)
+        self._start_polling()
+        return job_id
+
+    def cancel(self):
+        # bumping the generation makes any in-flight result stale
+        with self._lock:
+            self._generation += 1
+            if self._future is not None:
+                self._future.cancel()
+                self._future = None
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ----- worker thread -----
+    def _run(self, job_id, fn, args, on_success, on_error):
+        if job_id != self._generation:
+            return  # superseded before it even started
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._results.put((job_id, on_error, e))
+        else:
+            self._results.put((job_id, on_success, result))
+
+    # ----- main thread -----
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    job_id, callback, payload = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if job_id == self._generation and callback is not None:
+                    callback(payload)
+        finally:
+            if self.busy or not self._results.empty():
+                try:
+                    self.widget.after(self.poll_ms, self._poll)
+                except Exception:
+                    self._polling = False  # widget is gone
+            else:
+                self._polling = False
+
+
+# ===========================
+# Auto Refresh
+# ===========================
+class AutoRefresher:
+    """
+    Periodically refreshes the displayed city and every favorite.
+
+    Ticks are scheduled with widget.after() with some jitter, and each round
+    runs on its own FetchWorker with at most REFRESH_CONCURRENCY fetches in
+    flight. Favorites get their last_temp/condition columns updated, so the
+    favorites window can show fresh values without fetching. The displayed
+    city's WeatherResult is passed to on_current() on the main thread.
+    A city that fails is skipped for an exponentially growing backoff.
+
+    get_city returns the displayed (city, city_id or None), or None; with an
+    ID the city is refreshed by ID, so an ambiguous name can't switch it.
+    """
+
+    def __init__(self, widget, get_city, get_units, on_current, interval_s=0):
+        self.widget = widget
+        self.get_city = get_city
+        self.get_units = get_units
+        self.on_current = on_current
+        self.interval_s = interval_s
+        self.worker = FetchWorker(widget)
+        self._after_id = None
+        # a round cancelled by stop() keeps running, so a restarted timer could overlap it
+        self._round_lock = threading.Lock()
+        self._backoff = {}  # city key -> (failures, retry_at); only touched under _round_lock
+
+    def start(self):
+        self.stop()
+        if self.interval_s > 0:
+            self._schedule()
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self.worker.cancel()
+
+    def set_interval(self, interval_s):
+        self.interval_s = interval_s
+        self.start()
+
+    def _schedule(self):
+        delay = self.interval_s * (1 + random.uniform(-REFRESH_JITTER, REFRESH_JITTER))
+        self._after_id = self.widget.after(int(delay * 1000), self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        if not self.worker.busy:  # previous round still running: skip this one
+            try:
+                favorites = database.get_favorite_ids()
+            except Exception as e:
+                eventlog.error("auto_refresh_failed", e)
+                favorites = []
+            self.worker.submit(self._refresh_round, self.get_city(), favorites, self.get_units(),
+                               on_success=self._round_done,
+                               on_error=lambda e: eventlog.error("auto_refresh_failed", e))
+        self._schedule()
+
+    def _round_done(self, result):
+        if result is not None:
+            self.on_current(result)
+
+    # ----- worker thread -----
+    def _refresh_round(self, current, favorites, units):
+        """current: (city, city_id or None) or None; favorites: [(city, city_id or None), ...]"""
+        if not self._round_lock.acquire(blocking=False):
+            eventlog.event("auto_refresh_skipped", reason="round_in_progress")
+            return None
+        try:
+            return self._run_round(current, favorites, units)
+        finally:
+            self._round_lock.release()
+
+    def _run_round(self, current, favorites, units):
+        start = time.perf_counter()
+        current_city, current_id = current or (None, None)
+        now = time.time()
+        due = [(city, city_id) for city, city_id in favorites
+               if self._backoff.get(normalize_city(city), (0, 0))[1] <= now]
+        current_due = (current_city is not None and
+                       self._backoff.get(normalize_city(current_city), (0, 0))[1] <= now)
+
+        # favorites with a known ID go through the batched group endpoint;
+        # the rest are fetched by name once and get their ID recorded
+        by_id = {city_id: city for city, city_id in due if city_id is not None}
+        by_name = [city for city, city_id in due if city_id is None]
+
+        updates = []
+        new_ids = []
+        with ThreadPoolExecutor(max_workers=REFRESH_CONCURRENCY,
+                                thread_name_prefix="weatherly-refresh") as pool:
+            current_future = (pool.submit(fetch_weather, current_city, units, current_id, BACKGROUND,
+                                          False)
+                              if current_due else None)
+            group_future = pool.submit(fetch_group, list(by_id), units, BACKGROUND) if by_id else None
+            name_futures = [(city, pool.submit(fetch_current, city, units, None, BACKGROUND))
+                            for city in by_name]
+
+            fetched = []
+            if group_future is not None:
+                try:
+                    group = group_future.result()
+                except Exception as e:
+                    group = {}
+                    eventlog.error("auto_refresh_failed", e, cities=len(by_id))
+                for city_id, city in by_id.items():
+                    if city_id in group:
+                        fetched.append((city, group[city_id], False))
+                    else:
+                        self._failed(city, "missing from group response")
+            for city, future in name_futures:
+                try:
+                    data = future.result()
+                except Exception as e:
+                    self._failed(city, e)
+                    continue
+                fetched.append((city, data, True))
+
+            for city, data, by_name_fetch in fetched:
+                # one malformed payload fails that city, not the whole round
+                try:
+                    weather = (data.get("weather") or [{}])[0]
+                    update = (city, int(round(data["main"]["temp"])), weather.get("main", ""))
+                except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+                    self._failed(city, e)
+                    continue
+                self._backoff.pop(normalize_city(city), None)
+                updates.append(update)
+                if by_name_fetch and data.get("id") is not None:
+                    new_ids.append((city, data["id"]))
+
+            result = None
+            if current_future is not None:
+                try:
+                    result = current_future.result()
+                    self._backoff.pop(normalize_city(current_city), None)
+                except Exception as e:
+                    self._failed(current_city, e)
+
+        if updates:
+            database.update_favorites_weather(updates)
+        if new_ids:
+            database.set_favorite_city_ids(new_ids)
+        eventlog.event("auto_refresh", favorites=len(favorites), due=len(due),
+                       updated=len(updates), current=result is not None,
+                       duration_ms=_ms_since(start))
+        return result
+
+    def _failed(self, city, error):
+        key = normalize_city(city)
+        failures = self._backoff.get(key, (0, 0))[0] + 1
+        delay = min(self.interval_s * 2 ** failures, REFRESH_MAX_BACKOFF)
+        self._backoff[key] = (failures, time.time() + delay)
+        eventlog.warning("auto_refresh_city_failed", city=city, error=eventlog.error_text(error),
+                         error_type=type(error).__name__, failures=failures,
+                         backoff_s=round(delay))
+
+
+# ===========================
+# Offline Sync
+# ===========================
+class OfflineSync:
+    """
+    Refreshes lookups that were answered from the cache while offline.
+
+    Every OFFLINE_RETRY_INTERVAL seconds the pending lookups in `offline` are
+    fetched again on a FetchWorker, live only. The first one that still hits
+    an outage ends the round; one that fails for another reason (e.g. the
+    city no longer resolves) is dropped. Each fresh WeatherResult is passed
+    to on_result() on the main thread.
+    """
+
+    def __init__(self, widget, on_result, interval_s=OFFLINE_RETRY_INTERVAL):
+        self.widget = widget
+        self.on_result = on_result
+        self.interval_s = interval_s
+        self.worker = FetchWorker(widget)
+        self._after_id = None
+
+    def start(self):
+        self.stop()
+        self._schedule()
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self.worker.cancel()
+
+    def _schedule(self):
+        self._after_id = self.widget.after(int(self.interval_s * 1000), self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        pending = offline.pending()
+        if pending and not self.worker.busy:
+            self.worker.submit(self._replay, pending,
+                               on_success=self._replayed,
+                               on_error=lambda e: eventlog.error("offline_sync_failed", e))
+        self._schedule()
+
+    def _replayed(self, results):
+        for result in results:
+            self.on_result(result)
+
+    # ----- worker thread -----
+    def _replay(self, pending):
+        results = []
+        for city, city_id, units in pending:
+            try:
+                results.append(fetch_weather(city, units, city_id, BACKGROUND, allow_stale=False))
+            except Exception as e:
+                if _is_outage(e):
+                    break  # still offline; try again next round
+                eventlog.warning("offline_sync_dropped", city=city, error=eventlog.error_text(e))
+            offline.discard_pending(city, city_id, units)
+        return results